@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" Headless (batch) epg.dat export for one or more profiles. Can be used e.g. with cron.
+
+    Usage [from the directory containing the 'extensions' package]:
+        python3 -m extensions.epgexport.batch --config batch.json [--profile name ...] [--force] [--no-upload]
+
+    The configuration file (JSON):
+        {
+            "xmltv": "path or URL of the XMLTV source",
+            "channels": "path of the EPGImport channels file [channel id -> service reference]",
+            "workers": 1,
+            "cache": true,
+            "upload_workers": 4,
+            "window_before": 2, "window_after": 96, "max_events": 0, "max_desc_length": 0, "integrity_check": "fix",
+            "profiles": {
+                "name": {
+                    "data_path": "profile data path [with bouquet files]",
+                    "bouquets": ["userbouquet.favourites.tv"],
+                    "host": "receiver host", "user": "root", "password": "", "epg_dat_path": "/media/hdd/",
+                    "hosts": [{"host": "additional receiver host", "user": "root", "password": ""}],
+                    "xmltv_export": "path of the XMLTV subset with the profile channels only [*.xml.gz]"
+                }
+            }
+        }
+
+    The common values [e.g. "xmltv", "channels", filters] can be overridden in the profile.
+    The rebuild and upload are skipped if the input data has not changed since the last run.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+
+from extensions import CONFIG_PATH
+from .filters import filter_services
+from .upload import FtpUploader, Target
+from .validate import check_services
+from .writer import EpgWriter, Service, Event
+from .xmltv import (read_events, read_channels_map, download, is_url, filter_xmltv, write_channels_map,
+                    get_channels_path)
+
+STATE_PATH = f"{CONFIG_PATH}Epgexport{os.sep}batch_state"
+# Bump this value to force the rebuild after changes in the data writing.
+FORMAT_VERSION = 1
+# Options that affect the output data.
+FILTERS = ("window_before", "window_after", "max_events", "max_desc_length", "integrity_check", "xmltv_export")
+
+log = logging.getLogger("epgexport.batch")
+
+
+def get_file_hash(path, h=None):
+    h = h or hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(data)
+    return h
+
+
+def get_service_key(ref):
+    """ Returns the (SID, TID, NID, namespace) key of the service reference. """
+    return tuple(p.upper().lstrip("0") for p in ref.split(":")[3:7])
+
+
+def read_bouquet(path):
+    """ Returns a list of (service reference, name) from the Enigma2 bouquet file. """
+    services = []
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            if line.startswith("#SERVICE "):
+                ref = line[9:].strip()
+                flags = ref.split(":")[1:2]
+                # Skipping markers and sub-bouquets.
+                if flags and flags[0] not in ("64", "320", "832") and "FROM BOUQUET" not in ref:
+                    services.append([ref, None])
+            elif line.startswith("#DESCRIPTION") and services and services[-1][1] is None:
+                services[-1][1] = line[12:].strip(": \n")
+    return [tuple(s) for s in services]
+
+
+def get_profile_services(profile):
+    """ Returns a list of (service reference, name) from the selected profile bouquets without duplicates. """
+    services = {}
+    data_path = profile["data_path"]
+    for bq in profile.get("bouquets", ()):
+        for ref, name in read_bouquet(os.path.join(data_path, bq)):
+            services.setdefault(ref, name)
+    return list(services.items())
+
+
+def get_input_hash(options, services, xmltv_path, channels_path):
+    """ Returns the hash of all input data of the profile. """
+    h = hashlib.blake2b(digest_size=16)
+    filters = [options.get(k, None) for k in FILTERS]
+    h.update(repr((FORMAT_VERSION, filters, services)).encode("utf-8", errors="surrogatepass"))
+    get_file_hash(xmltv_path, h)
+    if channels_path and os.path.isfile(channels_path):
+        get_file_hash(channels_path, h)
+    return h.hexdigest()
+
+
+def build(services, xmltv_path, channels_path, dat_path, options):
+    """ Creates the epg.dat file for the given services.
+
+        :return: number of services with events.
+    """
+    mapping = read_channels_map(channels_path)
+    ref_channels = {get_service_key(r): ch for ch, refs in mapping.items() for r in refs}
+    # Services without the mapping are matched by name.
+    names = {n for r, n in services if n and get_service_key(r) not in ref_channels}
+    channels, events = read_events(xmltv_path, ids=set(ref_channels.values()), names=names)
+    name_channels = {n: ch for ch, ch_names in channels.items() for n in ch_names}
+
+    data, selected = [], {}
+    for ref, name in services:
+        ch_id = ref_channels.get(get_service_key(ref), None) or name_channels.get(name, None)
+        ch_events = events.get(ch_id, None)
+        if ch_events:
+            data.append((Service(name or ref, ref), [Event(e) for e in ch_events]))
+            selected.setdefault(ch_id, []).append(ref)
+
+    log.info(f"Services with EPG: {len(data)} of {len(services)}")
+    check_mode = options.get("integrity_check", "fix")
+    if check_mode:
+        data = check_services(data, check_mode == "fix", log.info)
+    xmltv_export = options.get("xmltv_export", None)
+    if xmltv_export and selected:
+        count = filter_xmltv(xmltv_path, xmltv_export, selected)
+        write_channels_map(get_channels_path(xmltv_export), selected)
+        log.info(f"XMLTV subset '{xmltv_export}' is written. Channels: {len(selected)}, programmes: {count}.")
+
+    data = filter_services(data, options.get("window_before", None), options.get("window_after", None),
+                           options.get("max_events", None), log.info)
+    if not data:
+        return 0
+
+    os.makedirs(os.path.dirname(dat_path), exist_ok=True)
+    cache_path = f"{dat_path}.cache" if options.get("cache", True) else None
+    writer = EpgWriter(dat_path, data, log.info, streaming=True, workers=options.get("workers", 1),
+                       cache_path=cache_path, desc_length=options.get("max_desc_length", None))
+    writer.write()
+    log.info("Timings: " + ", ".join(f"{p}: {t:.3f} s" for p, t in writer.timings.items()))
+    return len(data)
+
+
+def get_targets(profile):
+    """ Returns the upload targets of the profile [main host and additional hosts]. """
+    hosts = [profile] if profile.get("host") else []
+    hosts.extend(profile.get("hosts", []))
+    return [Target(h["host"], h.get("user", "root"), h.get("password", ""),
+                   h.get("epg_dat_path", profile.get("epg_dat_path", "/media/hdd/")), h.get("port", 21))
+            for h in hosts]
+
+
+def run_profile(name, profile, config, state, tmp_path, force=False, send=True):
+    """ Creates the epg.dat file for the profile.
+
+        The state of the profile contains input hashes of the last built and the last uploaded files.
+        The existing file is only uploaded if it has been built but not uploaded with the current input.
+
+        :return: (input hash, file path, upload targets), empty tuple if nothing has changed or None on error.
+    """
+    xmltv = profile.get("xmltv", config.get("xmltv"))
+    channels_path = profile.get("channels", config.get("channels"))
+    if not xmltv:
+        log.error(f"[{name}] XMLTV source is not specified!")
+        return None
+
+    if is_url(xmltv):
+        # The same source is downloaded only once for all profiles.
+        xmltv_path = os.path.join(tmp_path, hashlib.md5(xmltv.encode()).hexdigest())
+        if not os.path.isfile(xmltv_path):
+            log.info(f"Downloading XMLTV data from {xmltv}...")
+            try:
+                download(xmltv, xmltv_path)
+            except OSError as e:
+                log.error(f"[{name}] XMLTV data download error: {e}")
+                return None
+        xmltv = xmltv_path
+
+    # The profile values override the common ones.
+    options = {**config, **profile}
+    services = get_profile_services(profile)
+    input_hash = get_input_hash(options, services, xmltv, channels_path)
+    if options.get("window_before", None) is not None or options.get("window_after", None) is not None:
+        # The time window depends on the current time [hourly granularity].
+        input_hash = f"{input_hash}:{int(time.time()) // 3600}"
+    dat_path = os.path.join(profile["data_path"], "epg", "epg.dat")
+    targets = get_targets(profile) if send else []
+    profile_state = state.get(name, None)
+    profile_state = profile_state if isinstance(profile_state, dict) else {}
+    if not force and profile_state.get("built", None) == input_hash and os.path.isfile(dat_path):
+        if not targets or profile_state.get("uploaded", None) == input_hash:
+            log.info(f"[{name}] No changes since the last run. Skipping...")
+            return ()
+
+        log.info(f"[{name}] No changes since the last build. Uploading the existing file...")
+        return input_hash, dat_path, targets
+
+    log.info(f"[{name}] Creating '{dat_path}'...")
+    if not build(services, xmltv, channels_path, dat_path, options):
+        log.error(f"[{name}] No EPG data for the selected bouquets!")
+        return None
+
+    return input_hash, dat_path, targets
+
+
+def main(args=None):
+    parser = ArgumentParser(description="Headless epg.dat export.")
+    parser.add_argument("--config", required=True, help="path of the configuration file")
+    parser.add_argument("--profile", action="append", help="profile name [all profiles by default]")
+    parser.add_argument("--force", action="store_true", help="rebuild even if nothing has changed")
+    parser.add_argument("--no-upload", action="store_true", help="only create the files")
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    state = {}
+    if os.path.isfile(STATE_PATH):
+        with open(STATE_PATH, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+    profiles = config.get("profiles", {})
+    names = args.profile or list(profiles)
+    errors = 0
+
+    jobs = {}
+    with TemporaryDirectory() as tmp_path:
+        for name in names:
+            profile = profiles.get(name, None)
+            if not profile:
+                log.error(f"Profile '{name}' not found!")
+                errors += 1
+                continue
+
+            job = run_profile(name, profile, config, state, tmp_path, args.force, not args.no_upload)
+            if job is None:
+                errors += 1
+            elif job:
+                jobs[name] = job
+
+    # Uploading the files of all profiles concurrently [with a single bounded pool of workers].
+    uploads = [(name, dat_path, t) for name, (input_hash, dat_path, targets) in jobs.items() for t in targets]
+    with FtpUploader(config.get("upload_workers", FtpUploader.WORKERS), log.info) as uploader:
+        upload_results = uploader.upload_files([(path, t) for name, path, t in uploads])
+
+    results = {name: [] for name in jobs}
+    for (name, path, t), result in zip(uploads, upload_results):
+        results[name].append(result)
+
+    for name, (input_hash, dat_path, targets) in jobs.items():
+        profile_state = state.get(name, None)
+        profile_state = state[name] = profile_state if isinstance(profile_state, dict) else {}
+        profile_state["built"] = input_hash
+        # The file is uploaded only if there are targets and all uploads are done.
+        if results[name] and all(r.done for r in results[name]):
+            profile_state["uploaded"] = input_hash
+        elif results[name]:
+            log.error(f"[{name}] Upload error: {', '.join(r.host for r in results[name] if not r.done)}")
+            errors += 1
+
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    with open(STATE_PATH, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent="    ")
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
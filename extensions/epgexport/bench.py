@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" EpgWriter benchmarks with synthetic data. Runs headless (without GTK and the main app).
+
+    Usage [from the directory containing the 'extensions' package]:
+        python3 -m extensions.epgexport.bench --scenario small [--repeat 3] [--baseline bench.json] [--save]
+
+    The best of the repeated runs [after a warm-up run] is compared with the baseline.
+"""
+
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from io import BytesIO
+from tempfile import TemporaryDirectory
+
+from .descriptions import DescriptionTable
+from .writer import EpgWriter, Service, Event
+
+# Scenarios: name -> (services, events per service).
+SCENARIOS = {"small": (100, 1000),
+             "medium": (1500, 500),
+             "large": (5000, 2000)}
+
+WORDS = ("news", "movie", "sport", "live", "show", "series", "season", "episode", "weather", "music", "kids",
+         "documentary", "football", "final", "night", "morning", "talk", "comedy", "drama", "history")
+
+
+class SyntheticEvents:
+    """ Lazily generated events of a single service.
+
+        Titles and descriptions are taken from shared pools with a skewed
+        distribution, so they repeat like in real feeds.
+    """
+
+    def __init__(self, seed, count, titles, descriptions, start):
+        self._seed = seed
+        self._count = count
+        self._titles = titles
+        self._descriptions = descriptions
+        self._start = start
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        rnd = random.Random(self._seed)
+        titles, descriptions = self._titles, self._descriptions
+        t_max, d_max = len(titles) - 1, len(descriptions) - 1
+        start = self._start
+
+        for i in range(self._count):
+            duration = rnd.choice((300, 900, 1800, 2700, 3600, 5400, 7200))
+            yield Event({"e2eventstart": start,
+                         "e2eventduration": duration,
+                         "e2eventtitle": titles[int(t_max * rnd.random() ** 3)],
+                         "e2eventdescription": descriptions[int(d_max * rnd.random() ** 3)]})
+            start += duration
+
+
+def generate_services(services_count, events_count, seed=0, start=None):
+    """ Returns a list of (service, events) with synthetic data. """
+    rnd = random.Random(seed)
+    start = start or int(time.time()) // 3600 * 3600
+    # Pools sizes are proportional to the feed size.
+    titles = [" ".join(rnd.choices(WORDS, k=rnd.randint(1, 5))).title() for _ in
+              range(max(100, services_count * events_count // 50))]
+    descriptions = [" ".join(rnd.choices(WORDS, k=rnd.randint(5, 120))).capitalize() + "." for _ in
+                    range(max(100, services_count * events_count // 20))]
+
+    services = []
+    for i in range(services_count):
+        sid, tid, nid = i % 0xffff + 1, i // 0xffff + 1, 1
+        fav_id = f"1:0:1:{sid:X}:{tid:X}:{nid:X}:C00000:0:0:0:"
+        events = SyntheticEvents(seed + i, events_count, titles, descriptions, start + rnd.randint(0, 3600))
+        services.append((Service(f"Service {i}", fav_id), events))
+
+    return services
+
+
+def run(services, **kwargs):
+    """ Runs the writer and returns the phase timings. """
+    with TemporaryDirectory() as path:
+        writer = EpgWriter(os.path.join(path, "epg.dat"), services, log_func=lambda m: None, **kwargs)
+        with BytesIO() as tf:
+            start = time.perf_counter()
+            writer.write_services(tf)
+            write_time = time.perf_counter() - start
+            writer.finalize(tf)
+            finalize_time = time.perf_counter() - start - write_time
+            size = os.path.getsize(writer.epg_dat_path)
+
+    return {"write": write_time, "finalize": finalize_time, "size": size}
+
+
+def measure(services, repeat, **kwargs):
+    """ Returns the timings of the best run [after a warm-up run]. """
+    run(services, **kwargs)
+    results = [run(services, **kwargs) for _ in range(repeat)]
+    return min(results, key=lambda r: r["write"] + r["finalize"])
+
+
+def get_peak_memory(services, **kwargs):
+    """ Returns peak memory (in bytes) allocated by the writer. """
+    tracemalloc.start()
+    try:
+        run(services, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def get_descriptions_memory(count, seed=0):
+    """ Returns the average payload size and memory (in bytes) per description
+        for the dict based table and the DescriptionTable.
+    """
+    rnd = random.Random(seed)
+    lengths = [rnd.randint(20, 250) for _ in range(count)]
+    data = memoryview(rnd.randbytes(sum(lengths)))
+    payloads, pos = [], 0
+    for crc, length in zip(rnd.sample(range(1 << 32), count), lengths):
+        payloads.append((crc, data[pos:pos + length]))
+        pos += length
+    results = [len(data) / count]
+
+    for name in ("dict", "table"):
+        tracemalloc.start()
+        try:
+            if name == "dict":
+                # The previous layout: crc -> [payload, count].
+                table = {}
+                for crc, payload in payloads:
+                    table[crc] = [bytes(payload), 1]
+            else:
+                table = DescriptionTable()
+                for crc, payload in payloads:
+                    table.add(crc, payload)
+            results.append(tracemalloc.get_traced_memory()[0] / count)
+            del table
+        finally:
+            tracemalloc.stop()
+
+    return results
+
+
+def main(args=None):
+    parser = ArgumentParser(description="EpgWriter benchmark.")
+    parser.add_argument("--scenario", choices=SCENARIOS.keys(), default="small")
+    parser.add_argument("--services", type=int, help="number of services [overrides the scenario]")
+    parser.add_argument("--events", type=int, help="number of events per service [overrides the scenario]")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="number of measured runs [the best is used]")
+    parser.add_argument("--memory", action="store_true", help="measure peak memory [slower]")
+    parser.add_argument("--descriptions", type=int, help="measure memory of the description table with N entries")
+    parser.add_argument("--baseline", help="path of the baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="save results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=10, help="allowed slowdown in percent [default: 10]")
+    args = parser.parse_args(args)
+
+    if args.descriptions:
+        payload_size, dict_size, table_size = get_descriptions_memory(args.descriptions)
+        dict_size, table_size = dict_size - payload_size, table_size - payload_size
+        print(f"[descriptions: {args.descriptions}] Overhead per entry [payload: {payload_size:.0f} bytes]: "
+              f"dict: {dict_size:.1f} bytes, table: {table_size:.1f} bytes, ratio: {dict_size / table_size:.1f}x.")
+        return 0
+
+    services_count, events_count = SCENARIOS[args.scenario]
+    services_count = args.services or services_count
+    events_count = args.events or events_count
+    name = f"{services_count}x{events_count}:{args.workers}"
+    total = services_count * events_count
+
+    services = generate_services(services_count, events_count)
+    result = measure(services, max(args.repeat, 1), workers=args.workers)
+    rate = total / (result["write"] + result["finalize"])
+    print(f"[{name}] Events: {total}, write: {result['write']:.3f} s, finalize: {result['finalize']:.3f} s, "
+          f"{rate:.0f} events/s, file size: {result['size']} bytes.")
+
+    if args.memory:
+        print(f"[{name}] Peak memory: {get_peak_memory(services, workers=args.workers) / 1024 ** 2:.1f} MiB.")
+
+    if not args.baseline:
+        return 0
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.save:
+        baseline[name] = rate
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent="    ")
+        print(f"[{name}] Baseline saved.")
+        return 0
+
+    base_rate = baseline.get(name, None)
+    if not base_rate:
+        print(f"[{name}] No baseline for this configuration.")
+        return 0
+
+    slowdown = (base_rate - rate) / base_rate * 100
+    print(f"[{name}] Baseline: {base_rate:.0f} events/s, change: {-slowdown:+.1f}%.")
+    if slowdown > args.tolerance:
+        print(f"[{name}] Error. Slower than the baseline by more than {args.tolerance}%!")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
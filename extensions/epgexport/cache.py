@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+
+""" Persistent cache of the encoded service blocks.
+
+    Each block is kept in a separate file of the cache directory, so rewriting
+    of the changed blocks doesn't leave unused space. Files of the services
+    that are not written anymore are removed after each writing.
+"""
+
+import hashlib
+import os
+import pickle
+
+# Old [shelve] cache files.
+LEGACY_SUFFIXES = ("", ".dat", ".dir", ".bak", ".db")
+
+
+class BlockCache:
+    """ Service key -> (events hash, block data, description table). """
+
+    VERSION_FILE = "version"
+
+    def __init__(self, path, version):
+        """
+            :param path: cache directory path
+            :param version: format and options of the cached data [the cache is cleared if they differ]
+        """
+        self._path = path
+
+        for suffix in LEGACY_SUFFIXES:
+            if os.path.isfile(f"{path}{suffix}"):
+                os.remove(f"{path}{suffix}")
+        os.makedirs(path, exist_ok=True)
+
+        version_path = os.path.join(path, self.VERSION_FILE)
+        if self.read(version_path) != version:
+            self.prune(())
+            self.write(version_path, version)
+
+    def get_path(self, key):
+        return os.path.join(self._path, hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest())
+
+    def get_hash(self, key):
+        """ Returns the events hash of the cached service block or None. """
+        try:
+            with open(self.get_path(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def load(self, key):
+        """ Returns the cached (block data, description table) of the service. """
+        with open(self.get_path(key), "rb") as f:
+            pickle.load(f)
+            return pickle.load(f)
+
+    def save(self, key, ev_hash, block, descriptions):
+        path = self.get_path(key)
+        with open(f"{path}.tmp", "wb") as f:
+            # The hash is stored separately, so it can be checked without loading the block.
+            pickle.dump(ev_hash, f, protocol=4)
+            pickle.dump((block, descriptions), f, protocol=4)
+        os.replace(f"{path}.tmp", path)
+
+    def prune(self, keys):
+        """ Removes the files of the services that are not in the given keys. """
+        names = {os.path.basename(self.get_path(k)) for k in keys}
+        names.add(self.VERSION_FILE)
+        with os.scandir(self._path) as it:
+            for entry in it:
+                if entry.name not in names and entry.is_file():
+                    os.remove(entry.path)
+
+    @staticmethod
+    def read(path):
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    @staticmethod
+    def write(path, data):
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(data, f, protocol=4)
+        os.replace(f"{path}.tmp", path)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+
+""" Compact description table of the epg.dat file.
+
+    Payloads are stored one after another in a single arena [bytearray].
+    CRC, offset, length and reference count are kept in 'array' columns.
+    Lookup by CRC uses an open addressing hash table of row numbers,
+    so there are no Python objects per description.
+"""
+
+from array import array
+from tempfile import TemporaryFile
+
+
+class DescriptionTable:
+    """ Description table [CRC -> payload, reference count]. """
+
+    # Initial number of slots of the hash table [power of 2].
+    SLOTS = 1024
+
+    def __init__(self):
+        self._arena = bytearray()
+        self._crcs = array("I")
+        self._offsets = array("Q")
+        self._lengths = array("H")
+        self._counts = array("I")
+        # Row number + 1 for each slot [0 -> empty slot].
+        self._slots = array("I", bytes(4 * self.SLOTS))
+        self._mask = self.SLOTS - 1
+        self._size = 0
+        self._spill_file = None
+
+    def __len__(self):
+        return len(self._crcs)
+
+    def __getstate__(self):
+        if self._spill_file:
+            raise TypeError("The table with data in a temporary file can't be pickled.")
+        return self._arena, self._crcs, self._offsets, self._lengths, self._counts, self._slots, self._size
+
+    def __setstate__(self, state):
+        self._arena, self._crcs, self._offsets, self._lengths, self._counts, self._slots, self._size = state
+        self._mask = len(self._slots) - 1
+        self._spill_file = None
+
+    @property
+    def size(self):
+        """ Total size of the payloads in bytes. """
+        return self._size
+
+    @property
+    def spilled(self):
+        return self._spill_file is not None
+
+    def add_ref(self, crc, count=1):
+        """ Increments the reference count of the description.
+
+            :return: False if there is no description with the given CRC.
+        """
+        slots, crcs, mask = self._slots, self._crcs, self._mask
+        pos = crc & mask
+        while True:
+            row = slots[pos]
+            if not row:
+                return False
+            if crcs[row - 1] == crc:
+                self._counts[row - 1] += count
+                return True
+            pos = (pos + 1) & mask
+
+    def append(self, crc, payload, count=1):
+        """ Adds a new description. The CRC must not be in the table. """
+        row = len(self._crcs)
+        self._crcs.append(crc)
+        self._offsets.append(self._size)
+        self._lengths.append(len(payload))
+        self._counts.append(count)
+        self._size += len(payload)
+
+        if self._spill_file:
+            self._spill_file.write(payload)
+        else:
+            self._arena += payload
+
+        if (row + 1) * 2 > len(self._slots):
+            self.rehash(len(self._slots) * 2)
+        else:
+            self.set_slot(crc, row)
+
+    def add(self, crc, payload, count=1):
+        """ Adds the description or increments its reference count. """
+        if not self.add_ref(crc, count):
+            self.append(crc, payload, count)
+
+    def set_slot(self, crc, row):
+        slots, mask = self._slots, self._mask
+        pos = crc & mask
+        while slots[pos]:
+            pos = (pos + 1) & mask
+        slots[pos] = row + 1
+
+    def rehash(self, slots_count):
+        self._slots = array("I", bytes(4 * slots_count))
+        self._mask = slots_count - 1
+        set_slot = self.set_slot
+        for row, crc in enumerate(self._crcs):
+            set_slot(crc, row)
+
+    def merge(self, table):
+        """ Merges another table [e.g. from a worker process]. """
+        add = self.add
+        for crc, payload, count in table.items():
+            add(crc, payload, count)
+
+    def get_payload(self, row):
+        offset, length = self._offsets[row], self._lengths[row]
+        if self._spill_file:
+            self._spill_file.seek(offset)
+            return self._spill_file.read(length)
+        return bytes(self._arena[offset:offset + length])
+
+    def items(self):
+        """ Returns a generator of (crc, payload, count) in the insertion order. """
+        if self._spill_file:
+            self._spill_file.flush()
+            get_payload = self.get_payload
+            for row, (crc, count) in enumerate(zip(self._crcs, self._counts)):
+                yield crc, get_payload(row), count
+        else:
+            view = memoryview(self._arena)
+            for crc, offset, length, count in zip(self._crcs, self._offsets, self._lengths, self._counts):
+                yield crc, view[offset:offset + length], count
+
+    def sorted_items(self):
+        """ Returns a generator of (crc, count, payload) sorted by CRC [the order required by the epg.dat]. """
+        crcs, counts = self._crcs, self._counts
+        rows = sorted(range(len(crcs)), key=crcs.__getitem__)
+
+        if self._spill_file:
+            self._spill_file.flush()
+            get_payload = self.get_payload
+            for row in rows:
+                yield crcs[row], counts[row], get_payload(row)
+        else:
+            view, offsets, lengths = memoryview(self._arena), self._offsets, self._lengths
+            for row in rows:
+                offset = offsets[row]
+                yield crcs[row], counts[row], view[offset:offset + lengths[row]]
+
+    def spill(self):
+        """ Moves the payloads to a temporary file. Only the columns are kept in memory after that. """
+        if self._spill_file:
+            return
+
+        self._spill_file = TemporaryFile()
+        self._spill_file.write(self._arena)
+        self._arena = bytearray()
+
+    def close(self):
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" Event filters applied before the encoding. """
+
+import time
+from itertools import islice
+
+
+def get_start(event):
+    return event.event_data["e2eventstart"]
+
+
+def get_end(event):
+    data = event.event_data
+    return data["e2eventstart"] + data["e2eventduration"]
+
+
+def search(events, value, key, lo=0):
+    """ Returns the index of the first event with the key value >= the given value [events must be sorted]. """
+    hi = len(events)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if key(events[mid]) < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def get_time_window(before=None, after=None, now=None):
+    """ Returns the (start, end) timestamps of the time window.
+
+        :param before: hours before the current time [None -- unbounded]
+        :param after: hours after the current time [None -- unbounded]
+        :param now: current time [timestamp]
+    """
+    now = now or int(time.time())
+    return (now - int(before * 3600) if before is not None else None,
+            now + int(after * 3600) if after is not None else None)
+
+
+def filter_events(events, start=None, end=None, max_count=None):
+    """ Returns the events from the time window [start, end), limited by count.
+
+        Only the slice boundaries are searched for the events sorted by start and end time. Other events
+        [e.g. unsorted or overlapping without the integrity check] are filtered one by one.
+    """
+    if not is_sorted(events):
+        events = [e for e in events if (start is None or get_end(e) > start) and (end is None or get_start(e) < end)]
+        return events[:max_count] if max_count else events
+
+    lo, hi = 0, len(events)
+    if start is not None:
+        # The first event that ends after the window start.
+        lo = search(events, start + 1, get_end)
+    if end is not None:
+        # Events that start before the window end.
+        hi = search(events, end, get_start, lo)
+    if max_count:
+        hi = min(hi, lo + max_count)
+
+    return events if (lo, hi) == (0, len(events)) else events[lo:hi]
+
+
+def is_sorted(events):
+    """ Checks if the events are sorted by start time and their end times are in the same order.
+
+        The end times may be out of order for overlapping events [a long event contains the next one].
+    """
+    pairs = zip(events, islice(events, 1, None))
+    return all(get_start(a) <= get_start(b) and get_end(a) <= get_end(b) for a, b in pairs)
+
+
+def filter_services(services, before=None, after=None, max_count=None, log_func=print):
+    """ Applies filters to the list of (service, events).
+
+        Services without events after filtering are removed.
+    """
+    if before is None and after is None and not max_count:
+        return services
+
+    start, end = get_time_window(before, after)
+    total = sum(len(ev) for s, ev in services)
+    services = [(s, ev) for s, ev in ((s, filter_events(ev, start, end, max_count)) for s, ev in services) if ev]
+    log_func(f"Events after filtering: {sum(len(ev) for s, ev in services)} of {total}.")
+    return services
+
+
+if __name__ == "__main__":
+    pass
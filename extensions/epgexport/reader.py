@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" The epg.dat (ENIGMA_EPG_V8) file reader.
+
+    The file is memory-mapped, and the indexes of the service blocks and descriptions
+    are built on first access. Events and descriptions are decoded only when requested.
+
+    Usage [check and diff]: python3 -m extensions.epgexport.reader epg.dat [other epg.dat]
+"""
+
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from .crc import get_crc32
+
+Event = namedtuple("Event", ["id", "start", "duration", "refs"])
+Description = namedtuple("Description", ["crc", "count", "type", "data"])
+
+
+class EpgReader:
+    """ The epd.dat file reading class. """
+
+    MAGIC = 0x98765432
+    VERSION = b"ENIGMA_EPG_V8"
+    # DVB date (MJD) of the Unix epoch [1970-01-01].
+    EPOCH_DVB_DATE = 40587
+
+    s_header = struct.Struct("<I13sI")
+    s_I = struct.Struct("<I")
+    s_II = struct.Struct("<II")
+    s_IIII = struct.Struct("<IIII")
+    s_event = struct.Struct(">HHBBBBBB")
+
+    def __init__(self, path):
+        self.epg_dat_path = path
+        self._file = open(path, "rb")
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"The file '{path}' is empty!")
+
+        if len(self._data) < self.s_header.size:
+            self.close()
+            raise ValueError(f"The file '{path}' is too small!")
+
+        magic, version, self.services_count = self.s_header.unpack_from(self._data)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.close()
+            raise ValueError(f"The file '{path}' is not a valid {self.VERSION.decode()} file!")
+
+        self._srv_keys = None
+        self._srv_indexes = None
+        self._srv_offsets = None
+        self._desc_offset = None
+        self._desc_crcs = None
+        self._desc_offsets = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._data:
+            self._data.close()
+            self._data = None
+        self._file.close()
+
+    # ******************** Index ******************** #
+
+    def build_index(self):
+        """ Builds the service blocks index [(sid, nid, tid) -> block positions and offsets].
+
+            Several blocks [e.g. of IPTV services] may have the same key.
+        """
+        if self._srv_offsets is not None:
+            return
+
+        data = self._data
+        unpack_from = self.s_IIII.unpack_from
+        keys, indexes, offsets = [], {}, array("Q")
+        pos = self.s_header.size
+
+        for _ in range(self.services_count):
+            sid, nid, tid, count = unpack_from(data, pos)
+            indexes.setdefault((sid, nid, tid), []).append(len(keys))
+            keys.append((sid, nid, tid))
+            offsets.append(pos)
+            pos += self.s_IIII.size
+            for __ in range(count):
+                # EVENT HEADER (3 bytes) + EVENT DATA (size from the header).
+                pos += 3 + data[pos + 2]
+
+        offsets.append(pos)
+        self._srv_keys = keys
+        self._srv_indexes = indexes
+        self._srv_offsets = offsets
+        self._desc_offset = pos
+
+    def build_descriptions_index(self):
+        """ Builds the descriptions index [sorted CRC values and their offsets]. """
+        if self._desc_crcs is not None:
+            return
+
+        self.build_index()
+        data = self._data
+        pos = self._desc_offset
+        count = self.s_I.unpack_from(data, pos)[0]
+        pos += self.s_I.size
+        crcs, offsets = array("I"), array("Q")
+
+        for _ in range(count):
+            crcs.append(self.s_I.unpack_from(data, pos)[0])
+            offsets.append(pos)
+            # CRC + count (8 bytes) + type and length (2 bytes) + data.
+            pos += 10 + data[pos + 9]
+
+        self._desc_crcs = crcs
+        self._desc_offsets = offsets
+
+    @property
+    def services(self):
+        """ Returns the list of service keys (sid, nid, tid) of the blocks in the file order [may be repeated]. """
+        self.build_index()
+        return list(self._srv_keys)
+
+    @property
+    def descriptions_count(self):
+        self.build_descriptions_index()
+        return len(self._desc_crcs)
+
+    # ******************** Data ******************** #
+
+    def get_block(self, index):
+        """ Returns a memoryview of the service block [header and events] by its position in the file. """
+        self.build_index()
+        return memoryview(self._data)[self._srv_offsets[index]:self._srv_offsets[index + 1]]
+
+    def get_blocks(self, service):
+        """ Returns the list of the service blocks in the file order. """
+        self.build_index()
+        return [self.get_block(i) for i in self._srv_indexes.get(service, ())]
+
+    def get_events(self, service):
+        """ Returns a generator of the service events [of all its blocks, start and duration in seconds]. """
+        for block in self.get_blocks(service):
+            yield from self.get_block_events(block)
+
+    def get_block_events(self, block):
+        """ Returns a generator of the events of the service block. """
+        count = self.s_IIII.unpack_from(block)[3]
+        pos = self.s_IIII.size
+        unpack_from = self.s_event.unpack_from
+
+        for _ in range(count):
+            size = block[pos + 2]
+            ev_id, date, h, m, s, dh, dm, ds = unpack_from(block, pos + 3)
+            start = (date - self.EPOCH_DVB_DATE) * 86400 + self.from_bcd(h, m, s)
+            refs = struct.unpack_from(f"<{(size - 10) // 4}I", block, pos + 13)
+            yield Event(ev_id, start, self.from_bcd(dh, dm, ds), refs)
+            pos += 3 + size
+
+    def get_description(self, crc):
+        """ Returns the description by its CRC value or None if not found. """
+        self.build_descriptions_index()
+        index = bisect_left(self._desc_crcs, crc)
+        if index == len(self._desc_crcs) or self._desc_crcs[index] != crc:
+            return None
+
+        pos = self._desc_offsets[index]
+        crc, count = self.s_II.unpack_from(self._data, pos)
+        d_type, size = self._data[pos + 8], self._data[pos + 9]
+        return Description(crc, count, d_type, self._data[pos + 10:pos + 10 + size])
+
+    def get_text(self, crc):
+        """ Returns the decoded text of the title (0x4d) or long description part (0x4e). """
+        desc = self.get_description(crc)
+        if not desc:
+            return None
+        # Title: lang (3), length, encoding, text, '\0'.
+        # Long description: number, lang (3), 0x00, length, encoding, text.
+        text = desc.data[5:-1] if desc.type == 0x4d else desc.data[7:]
+        return text.decode("utf-8", errors="ignore")
+
+    def get_event_texts(self, event):
+        """ Returns the title and the long description of the event. """
+        title, *long_desc = event.refs
+        return self.get_text(title), "".join(self.get_text(c) or "" for c in long_desc)
+
+    @staticmethod
+    def from_bcd(h, m, s):
+        return ((h >> 4) * 10 + (h & 0x0f)) * 3600 + ((m >> 4) * 10 + (m & 0x0f)) * 60 + (s >> 4) * 10 + (s & 0x0f)
+
+    # ******************** Checks ******************** #
+
+    def check(self):
+        """ Checks the description references and CRC values.
+
+            :return: list of found problems [empty if the file is correct].
+        """
+        self.build_descriptions_index()
+        errors = []
+
+        if any(a >= b for a, b in zip(self._desc_crcs, self._desc_crcs[1:])):
+            errors.append("Descriptions are not in ascending order of CRC values.")
+
+        refs = {}
+        for index in range(len(self._srv_keys)):
+            for event in self.get_block_events(self.get_block(index)):
+                for crc in event.refs:
+                    refs[crc] = refs.get(crc, 0) + 1
+
+        for crc, count in refs.items():
+            desc = self.get_description(crc)
+            if not desc:
+                errors.append(f"Missing description for the reference: {crc:#010x}.")
+            elif desc.count != count:
+                errors.append(f"Wrong reference count for the description {crc:#010x}: {desc.count} != {count}.")
+
+        for crc in self._desc_crcs:
+            desc = self.get_description(crc)
+            if crc not in refs:
+                errors.append(f"Unused description: {crc:#010x}.")
+            if get_crc32(bytes(desc.data), desc.type) != crc:
+                errors.append(f"Wrong CRC value for the description: {crc:#010x}.")
+
+        return errors
+
+    def diff(self, other):
+        """ Returns a structural difference with the other file.
+
+            Blocks are compared without event IDs, because they depend on the position of the block.
+            Blocks with the same key are compared in the file order.
+
+            :return: dict with added, removed and changed services and added and removed descriptions.
+        """
+        self.build_descriptions_index()
+        other.build_descriptions_index()
+        keys, other_keys = self._srv_indexes.keys(), other._srv_indexes.keys()
+        changed = [s for s in keys & other_keys if not self.is_same_blocks(self.get_blocks(s), other.get_blocks(s))]
+        crcs, other_crcs = set(self._desc_crcs), set(other._desc_crcs)
+
+        return {"added": sorted(other_keys - keys),
+                "removed": sorted(keys - other_keys),
+                "changed": sorted(changed),
+                "added_descriptions": len(other_crcs - crcs),
+                "removed_descriptions": len(crcs - other_crcs)}
+
+    def is_same_blocks(self, blocks, other_blocks):
+        if len(blocks) != len(other_blocks):
+            return False
+
+        return all(self.is_same_block(b, o) for b, o in zip(blocks, other_blocks))
+
+    def is_same_block(self, block, other_block):
+        if block == other_block:
+            return True
+        if len(block) != len(other_block):
+            return False
+
+        return self.mask_event_ids(block) == self.mask_event_ids(other_block)
+
+    def mask_event_ids(self, block):
+        block = bytearray(block)
+        count = self.s_IIII.unpack_from(block)[3]
+        pos = self.s_IIII.size
+
+        for _ in range(count):
+            block[pos + 3:pos + 5] = b"\0\0"
+            pos += 3 + block[pos + 2]
+
+        return block
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m extensions.epgexport.reader epg.dat [other epg.dat]")
+        sys.exit(2)
+
+    with EpgReader(sys.argv[1]) as reader:
+        print(f"Services: {reader.services_count}, descriptions: {reader.descriptions_count}")
+        problems = reader.check()
+        [print(p) for p in problems]
+
+        if len(sys.argv) > 2:
+            with EpgReader(sys.argv[2]) as other_reader:
+                [print(f"{k}: {v}") for k, v in reader.diff(other_reader).items()]
+
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" Concurrent file upload to multiple receivers via FTP. """
+
+import os
+import time
+from collections import namedtuple, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from ftplib import FTP, all_errors, error_perm
+from threading import Lock
+
+Target = namedtuple("Target", ["host", "user", "password", "path", "port"], defaults=(21,))
+UploadResult = namedtuple("UploadResult", ["host", "done", "size", "time", "error"])
+
+
+class FtpUploader:
+    """ Uploads files to multiple receivers with a bounded pool of workers.
+
+        FTP sessions are reused for the same credentials. Interrupted transfers are resumed (REST)
+        and the remote file size is checked after the upload.
+        The file is uploaded with a temporary name and renamed after the check.
+    """
+    WORKERS = 4
+    RETRIES = 3
+    TIMEOUT = 30
+
+    def __init__(self, workers=WORKERS, log_func=print, timeout=TIMEOUT, retries=RETRIES):
+        self._workers = workers
+        self._timeout = timeout
+        self._retries = retries
+        self._sessions = {}
+        self._locks = defaultdict(Lock)
+        self.log = log_func
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        for ftp in self._sessions.values():
+            try:
+                ftp.quit()
+            except all_errors:
+                ftp.close()
+        self._sessions.clear()
+
+    @staticmethod
+    def get_session_key(target):
+        """ Returns the key of the session [and the lock] of the target. """
+        return target.host, target.port, target.user, target.password
+
+    def get_session(self, target, reconnect=False):
+        key = self.get_session_key(target)
+        ftp = self._sessions.pop(key, None)
+        if ftp and not reconnect:
+            try:
+                ftp.voidcmd("NOOP")
+            except all_errors:
+                ftp.close()
+            else:
+                self._sessions[key] = ftp
+                return ftp
+        elif ftp:
+            ftp.close()
+
+        ftp = FTP(timeout=self._timeout, encoding="utf-8")
+        ftp.connect(target.host, target.port)
+        ftp.login(target.user, target.password)
+        self._sessions[key] = ftp
+        return ftp
+
+    @staticmethod
+    def get_remote_size(ftp, name):
+        try:
+            ftp.voidcmd("TYPE I")
+            return ftp.size(name) or 0
+        except error_perm:
+            return 0
+
+    def upload(self, path, targets):
+        """ Uploads the file to all targets concurrently.
+
+            :return: list of UploadResult in the targets order.
+        """
+        return self.upload_files([(path, t) for t in targets])
+
+    def upload_files(self, uploads):
+        """ Uploads the files to the targets concurrently [in a single pool of workers].
+
+            :param uploads: list of (file path, target)
+            :return: list of UploadResult in the uploads order.
+        """
+        if not uploads:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self._workers, len(uploads))) as executor:
+            results = list(executor.map(lambda u: self.upload_file(*u), uploads))
+
+        done = [r for r in results if r.done]
+        self.log(f"Uploaded: {len(done)} of {len(results)}.")
+        return results
+
+    def upload_file(self, path, target):
+        """ Uploads the file to a single target. Uploads with the same session are serialized. """
+        name = os.path.basename(path)
+        part_name = f"{name}.part"
+        size = os.path.getsize(path)
+        error = None
+
+        with self._locks[self.get_session_key(target)]:
+            start = time.perf_counter()
+            for attempt in range(self._retries):
+                try:
+                    ftp = self.get_session(target, reconnect=attempt > 0)
+                    ftp.cwd(target.path)
+                    # Resuming the interrupted transfer.
+                    offset = self.get_remote_size(ftp, part_name) if attempt else 0
+                    offset = offset if offset <= size else 0
+                    if offset:
+                        self.log(f"[{target.host}] Resuming upload from {offset} bytes...")
+
+                    with open(path, "rb") as f:
+                        f.seek(offset)
+                        ftp.storbinary(f"STOR {part_name}", f, rest=offset or None)
+
+                    remote_size = self.get_remote_size(ftp, part_name)
+                    if remote_size != size:
+                        raise OSError(f"The remote file size is incorrect: {remote_size} != {size}")
+
+                    try:
+                        ftp.delete(name)
+                    except error_perm:
+                        pass  # The file does not exist yet.
+                    ftp.rename(part_name, name)
+                except all_errors as e:
+                    error = e
+                    self.log(f"[{target.host}] Upload error [attempt {attempt + 1}]: {e}")
+                else:
+                    up_time = time.perf_counter() - start
+                    speed = size / up_time / 1024 ** 2 if up_time else 0
+                    self.log(f"[{target.host}] Done! {size} bytes in {up_time:.2f} s [{speed:.2f} MiB/s].")
+                    return UploadResult(target.host, True, size, up_time, None)
+
+        return UploadResult(target.host, False, size, time.perf_counter() - start, error)
+
+
+if __name__ == "__main__":
+    pass
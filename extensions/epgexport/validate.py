@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" EPG data integrity check before the export.
+
+    Each service is checked in a single sweep over its events [O(n), the events are sorted only if needed].
+"""
+
+from collections import Counter
+
+
+def check_events(events, fix=True, stats=None):
+    """ Checks the events of a single service.
+
+        Events without a start time or with zero or negative duration are dropped.
+        With fix=True, an overlapped event is trimmed to the start of the next one,
+        and an event with the same start time as the previous one is dropped.
+
+        :param events: list of events [with the event_data attribute]
+        :param fix: fix the overlaps
+        :param stats: Counter for the check results
+        :return: checked events [the same list if nothing has been changed].
+    """
+    stats = Counter() if stats is None else stats
+    valid, changed, unsorted = [], False, False
+    prev_start = None
+
+    for e in events:
+        ed = e.event_data
+        start, duration = ed.get("e2eventstart", None), ed.get("e2eventduration", None)
+        if start is None or not duration or duration < 0:
+            stats["invalid"] += 1
+            changed = True
+            continue
+
+        if prev_start is not None and start < prev_start:
+            unsorted = True
+        prev_start = start
+        valid.append(e)
+
+    if unsorted:
+        stats["unsorted"] += 1
+        valid.sort(key=lambda ev: ev.event_data["e2eventstart"])
+        changed = True
+
+    checked = []
+    prev_end = None
+    for e in valid:
+        ed = e.event_data
+        start = ed["e2eventstart"]
+        end = start + ed["e2eventduration"]
+
+        if prev_end is not None:
+            if start < prev_end:
+                stats["overlaps"] += 1
+                if fix:
+                    prev = checked[-1]
+                    prev_start = prev.event_data["e2eventstart"]
+                    if start == prev_start:
+                        changed = True
+                        continue
+                    # The event data is copied, so the source data is not modified.
+                    checked[-1] = prev._replace(event_data={**prev.event_data, "e2eventduration": start - prev_start})
+                    changed = True
+                else:
+                    end = max(end, prev_end)
+            elif start > prev_end:
+                gap = start - prev_end
+                stats["gaps"] += 1
+                stats["gaps_time"] += gap
+                if gap > stats["max_gap"]:
+                    stats["max_gap"] = gap
+
+        checked.append(e)
+        prev_end = end
+
+    return checked if changed else events
+
+
+def check_services(services, fix=True, log_func=print):
+    """ Checks the events of the list of (service, events) and logs the summary.
+
+        Services without valid events are removed.
+    """
+    stats = Counter()
+    services = [(s, ev) for s, ev in ((s, check_events(ev, fix, stats)) for s, ev in services) if ev]
+
+    msg = (f"Integrity check. Unsorted services: {stats['unsorted']}, invalid events: {stats['invalid']}, "
+           f"overlaps: {stats['overlaps']}{' [fixed]' if fix else ''}, gaps: {stats['gaps']}")
+    if stats["gaps"]:
+        msg += (f" [total: {stats['gaps_time'] / 3600:.1f} h, "
+                f"average: {stats['gaps_time'] / stats['gaps'] / 60:.0f} min, max: {stats['max_gap'] / 60:.0f} min]")
+    log_func(f"{msg}.")
+    return services
+
+
+if __name__ == "__main__":
+    pass
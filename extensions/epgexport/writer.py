@@ -0,0 +1,605 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+
+import hashlib
+import os
+import pickle
+import struct
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import repeat
+from shutil import copyfileobj
+
+from .cache import BlockCache
+from .crc import get_crc32
+from .descriptions import DescriptionTable
+
+# Minimal service and event types for usage without the main app [headless mode].
+Service = namedtuple("Service", ["service", "fav_id"])
+Event = namedtuple("Event", ["event_data"])
+
+
+class WriteCanceled(Exception):
+    """ Raised when the epg.dat file creation is canceled. """
+
+
+class EpgWriter:
+    """ The epd.dat file writing class.
+
+        The base writing code and algorithm was taken from the 'epgdat.py' file of EPGImport plugin from here:
+        https://github.com/OpenPLi/enigma2-plugin-extensions-epgimport
+    """
+    # CRC32 routine used by Dreambox for computing REF DESC value (see crc module).
+    get_crc32 = staticmethod(get_crc32)
+
+    LB_ENDIAN = '<'
+    EPG_PROLEPTIC_ZERO_DAY = 678576
+    # DVB date (MJD) of the Unix epoch [1970-01-01].
+    EPOCH_DVB_DATE = 719163 - EPG_PROLEPTIC_ZERO_DAY
+    # BCD values for hours, minutes and seconds.
+    BCD = tuple((i % 10) + (16 * (i // 10)) for i in range(60))
+    # Maximum number of REF DESC values for a single event (title + 15 long description parts).
+    MAX_REFS = 16
+
+    # Size of the description table in bytes after which it is moved to a temporary file [streaming mode].
+    SPILL_SIZE = 32 * 1024 * 1024
+    # Minimum number of events in a single part of the data for the parallel mode.
+    SHARD_SIZE = 1000
+    # Version of the encoded service blocks cache format.
+    CACHE_VERSION = 3
+
+    def __init__(self, path, services, log_func=print, streaming=False, spill_size=SPILL_SIZE, workers=1,
+                 cache_path=None, desc_length=None, progress_func=None, cancel_event=None, mp_context=None):
+        """
+            :param path: epg.dat file path
+            :param services: list of (service, events) tuples
+            :param log_func: logging function
+            :param streaming: if True, the data is written directly to the file (bounded memory mode)
+            :param spill_size: description table size limit (in bytes) for the streaming mode
+            :param workers: number of processes used for the events encoding (parallel mode if > 1)
+            :param cache_path: path of the encoded service blocks cache (incremental mode)
+            :param desc_length: maximum length of the long description (in characters)
+            :param progress_func: function called with the writer after each written service
+            :param cancel_event: threading.Event [or similar] to cancel the writing
+            :param mp_context: multiprocessing context of the worker processes [the default if None]
+        """
+        self.epg_dat_path = path
+        self._services = services
+        self._streaming = streaming
+        self._spill_size = spill_size
+        self._workers = workers
+        self._cache_path = cache_path
+        self._desc_length = desc_length
+        self._progress_func = progress_func
+        self._cancel_event = cancel_event
+        self._mp_context = mp_context
+
+        self.header1_srv_count = 0
+        self.header2_desc_count = 0
+        self.total_events = 0
+        self.shared_services = 0
+        self.shared_events = 0
+        self.bytes_written = 0
+        # Phase -> time in seconds.
+        self.timings = {}
+        self._descriptions = DescriptionTable()
+
+        self.s_BB = struct.Struct("BB")
+        self.s_b_H = struct.Struct(">H")
+        self.s_b_HBBB = struct.Struct(">HBBB")
+        self.s_event = struct.Struct(">BBBHHBBBBBB")
+        self.s_refs = tuple(struct.Struct(f"{self.LB_ENDIAN}{i}I") for i in range(self.MAX_REFS + 1))
+        self.s_I = struct.Struct(self.LB_ENDIAN + "I")
+        self.s_II = struct.Struct(self.LB_ENDIAN + "II")
+        self.s_IIII = struct.Struct(self.LB_ENDIAN + "IIII")
+        self.s_B3sHBB = struct.Struct("B3sHBB")
+        self.s_B3sBBB = struct.Struct("B3sBBB")
+        self.s_3sBB = struct.Struct("3sBB")
+        self.s_header = struct.Struct(self.LB_ENDIAN + "I13sI")
+
+        self.log = log_func
+
+    def short_desc(self, desc):
+        """ Assembling short description (type 0x4d , it's the Title) and compute its crc.
+
+            0x15 -> UTF-8 encoding.
+        """
+        b_desc = desc.encode(encoding="utf-8", errors="ignore")[:240]
+        b_data = self.s_3sBB.pack(b"eng", len(b_desc) + 1, 0x15) + b_desc + b"\0"
+        return self.get_crc32(b_data, 0x4d), b_data
+
+    def long_desc(self, desc):
+        """ Assembling long description (type 0x4e) and compute its crc.
+
+            Compute total number of descriptions, block 245 bytes each
+            number of descriptions start to index 0
+        """
+        res = []
+        b_desc = desc.encode(encoding="utf-8", errors="ignore")
+        # Maximum number of data chunks. Used for limit the description size.
+        max_count = 15
+        desc_count = (len(b_desc) + 244) // 245
+        if desc_count > max_count:
+            desc_count = max_count
+
+        for i in range(desc_count):
+            ssub = b_desc[i * 245:i * 245 + 245] if i < max_count else b"..."
+            b_data = self.s_B3sBBB.pack((i << 4) + (desc_count - 1), b"eng", 0x00, int(len(ssub) + 1), 0x15) + ssub
+            res.append((self.get_crc32(b_data, 0x4e), b_data))
+        return res
+
+    def get_event(self, ed):
+        title = ed.get("e2eventtitle", "")
+        desc = ed.get("e2eventdescription", None) or title
+        if self._desc_length:
+            desc = desc[:self._desc_length]
+        return ed.get("e2eventstart"), ed.get("e2eventduration"), self.short_desc(title), self.long_desc(desc)
+
+    def write(self):
+        """ Creates the epg.dat file.
+
+            The file is written to a temporary path and replaces the existing one only on success.
+            Raises WriteCanceled if the writing is canceled.
+        """
+        if self._streaming:
+            self.write_stream()
+            return
+
+        with BytesIO() as tf:
+            start = time.perf_counter()
+            self.write_services(tf)
+            self.timings["encode"] = time.perf_counter() - start
+
+            if len(self._descriptions) > 0:
+                start = time.perf_counter()
+                self.finalize(tf)
+                self.timings["finalize"] = time.perf_counter() - start
+
+    def write_stream(self):
+        """ Writes the first section directly to the file and patches the services count afterwards. """
+        tmp_path = f"{self.epg_dat_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as dat_fd:
+                # HEADER 1. The services count will be patched later.
+                dat_fd.write(self.s_header.pack(0x98765432, b'ENIGMA_EPG_V8', 0))
+                start = time.perf_counter()
+                self.write_services(dat_fd)
+                self.timings["encode"] = time.perf_counter() - start
+
+                if len(self._descriptions) > 0:
+                    start = time.perf_counter()
+                    self.write_descriptions(dat_fd)
+                    dat_fd.seek(self.s_header.size - self.s_I.size)
+                    dat_fd.write(self.s_I.pack(self.header1_srv_count))
+                    self.timings["finalize"] = time.perf_counter() - start
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        finally:
+            self._descriptions.close()
+
+        if len(self._descriptions) > 0:
+            os.replace(tmp_path, self.epg_dat_path)
+            self.log("The 'epg.dat' file creation is complete.")
+        else:
+            os.remove(tmp_path)
+
+    def check_canceled(self):
+        if self._cancel_event and self._cancel_event.is_set():
+            raise WriteCanceled("The 'epg.dat' file creation is canceled.")
+
+    def update_progress(self, events_count, size):
+        """ Updates the progress counters after writing a service block. """
+        self.total_events += events_count
+        self.bytes_written += size
+        self.check_canceled()
+
+        if self._progress_func:
+            self._progress_func(self)
+
+    def get_services(self):
+        """ Returns a generator of (sid, nid, tid, events, key) for the services that can be written.
+
+            The key is the service reference [fav_id]. The (sid, nid, tid) values are not unique,
+            e.g. for IPTV services that differ only by URL or DVB services that differ only by namespace.
+        """
+        default_iptv_ref_detected = False
+        def_ref_data = ("0", "0", "0")
+        keys = Counter()
+
+        for srv, ev in self._services:
+            # sid, nid, tid.
+            sd = srv.fav_id.split(":")
+            if len(sd) == 4:
+                sid, nid, tid, _ = sd
+            else:
+                sid, nid, tid = sd[3], sd[5], sd[4]
+                if (sid, nid, tid) == def_ref_data:
+                    # Detecting IPTV services with default values of SID, NIT, TID.
+                    if not default_iptv_ref_detected:
+                        self.log("Detected IPTV service(s) with values for [SID, NID, TID] = 0. Skipping...")
+                        default_iptv_ref_detected = True
+                    continue
+
+            try:
+                sid, nid, tid = int(sid, 16), int(nid, 16), int(tid, 16)
+            except ValueError as e:
+                self.log(f"Getting service [{srv.service}] data error: {e}")
+                continue
+
+            # The same service may be selected more than once.
+            keys[srv.fav_id] += 1
+            count = keys[srv.fav_id]
+            yield sid, nid, tid, ev, srv.fav_id if count == 1 else f"{srv.fav_id}#{count}"
+
+    def get_shared_services(self):
+        """ Returns a list of (sid, nid, tid, events data, signature, first event start) and signature counts.
+
+            Services with the same signature have identical events (or identical except for a time offset),
+            so they can share a single encoded block.
+        """
+        services = []
+        for sid, nid, tid, ev, key in self.get_services():
+            events_data = [e.event_data for e in ev]
+            services.append((sid, nid, tid, events_data, *get_events_signature(events_data)))
+
+        return services, Counter(s[4] for s in services)
+
+    def write_services(self, tf):
+        """ Writes the first EPG.DAT section (services and events) to the given file object. """
+        if self._cache_path:
+            self.write_services_cached(tf)
+        elif self._workers > 1:
+            self.write_services_parallel(tf)
+        else:
+            services, counts = self.get_shared_services()
+            templates = {}
+            event_id = 0
+
+            for sid, nid, tid, events_data, sig, start in services:
+                if counts[sig] == 1:
+                    event_id = self.write_service(tf, sid, nid, tid, events_data, event_id)
+                    continue
+
+                if sig not in templates:
+                    templates[sig] = (*encode_services([(sid, nid, tid, events_data)], self._desc_length)[0], start)
+                event_id = self.write_shared_block(tf, templates, counts, sid, nid, tid, events_data, sig, start,
+                                                   event_id)
+
+        if self.shared_services:
+            self.log(f"Services with shared EPG data: {self.shared_services}. Events not encoded: {self.shared_events}")
+
+    def write_services_parallel(self, tf):
+        """ Encodes services in a process pool.
+
+            Only the first service for each events signature is encoded.
+            The blocks are written in the original order with the event IDs shifted to the current position.
+        """
+        services, counts = self.get_shared_services()
+        shards, shard, shard_size, signatures = [], [], 0, set()
+        max_shard_size = max(self.SHARD_SIZE, sum(len(s[3]) for s in services) // (self._workers * 4))
+
+        for sid, nid, tid, events_data, sig, start in services:
+            if sig in signatures:
+                continue
+
+            signatures.add(sig)
+            shard.append((sid, nid, tid, events_data))
+            shard_size += len(events_data)
+            if shard_size >= max_shard_size:
+                shards.append(shard)
+                shard, shard_size = [], 0
+
+        if shard:
+            shards.append(shard)
+
+        self.log(f"Encoding services in {len(shards)} parts [workers: {self._workers}]...")
+        blocks = self.encode_parallel(shards)
+        try:
+            templates = {}
+            event_id = 0
+
+            for sid, nid, tid, events_data, sig, start in services:
+                if sig not in templates:
+                    templates[sig] = (*next(blocks), start)
+                event_id = self.write_shared_block(tf, templates, counts, sid, nid, tid, events_data, sig, start,
+                                                   event_id)
+        finally:
+            blocks.close()
+
+    def encode_parallel(self, shards, chunk_size=1):
+        """ Returns a generator of encoded blocks of the services shards [in a process pool].
+
+            The pending shards are canceled when the generator is closed.
+        """
+        executor = ProcessPoolExecutor(max_workers=self._workers, mp_context=self._mp_context)
+        try:
+            for blocks in executor.map(encode_services, shards, repeat(self._desc_length), chunksize=chunk_size):
+                self.check_canceled()
+                yield from blocks
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def write_shared_block(self, tf, templates, counts, sid, nid, tid, events_data, sig, start, event_id):
+        """ Writes the service block based on the encoded block with the same signature.
+
+            :return: the last used event ID.
+        """
+        block, events, t_start = templates[sig]
+        starts = None if start == t_start else [d.get("e2eventstart") for d in events_data]
+        block, event_id = self.rebase_block(block, event_id, (sid, nid, tid), starts)
+        tf.write(block)
+        self.header1_srv_count += 1
+        self.merge_descriptions(events)
+        self.update_progress(len(events_data), len(block))
+
+        counts[sig] -= 1
+        if counts[sig]:
+            self.shared_services += 1
+            self.shared_events += len(events_data)
+        else:
+            del templates[sig]
+
+        return event_id
+
+    def write_services_cached(self, tf):
+        """ Writes services using the persistent cache of encoded service blocks.
+
+            Only services with changed events are encoded. The event IDs of the cached blocks
+            are shifted to the current position, and their description tables are merged.
+        """
+        try:
+            cache = BlockCache(self._cache_path, (self.CACHE_VERSION, self._desc_length))
+        except OSError as e:
+            self.log(f"Cache opening error: {e}. Encoding all services...")
+            self._cache_path = None
+            self.write_services(tf)
+            return
+
+        keys, misses, signatures = [], [], {}
+        for sid, nid, tid, ev, key in self.get_services():
+            events_data = [e.event_data for e in ev]
+            ev_hash = get_events_hash(events_data)
+            keys.append(key)
+
+            if cache.get_hash(key) != ev_hash:
+                sig, start = get_events_signature(events_data)
+                misses.append((key, ev_hash, (sid, nid, tid, events_data), sig, start))
+                signatures.setdefault(sig, len(misses) - 1)
+
+        # Only the first service for each events signature is encoded.
+        data = [[misses[i][2]] for i in signatures.values()]
+        self.log(f"Services to encode: {len(data)}, shared: {len(misses) - len(data)}, "
+                 f"from cache: {len(keys) - len(misses)}")
+
+        if self._workers > 1 and len(data) > 1:
+            results = self.encode_parallel(data, max(1, len(data) // (self._workers * 4)))
+            try:
+                blocks = list(results)
+            finally:
+                results.close()
+        else:
+            blocks = []
+            for d in data:
+                self.check_canceled()
+                blocks.append(encode_services(d, self._desc_length)[0])
+
+        templates = {sig: (*b, misses[i][4]) for (sig, i), b in zip(signatures.items(), blocks)}
+        for i, (key, ev_hash, (sid, nid, tid, events_data), sig, start) in enumerate(misses):
+            block, events, t_start = templates[sig]
+            if i != signatures[sig]:
+                starts = None if start == t_start else [d.get("e2eventstart") for d in events_data]
+                block, last_id = self.rebase_block(block, 0, (sid, nid, tid), starts)
+            cache.save(key, ev_hash, bytes(block), events)
+
+        event_id = 0
+        for key in keys:
+            block, events = cache.load(key)
+            block, event_id = self.rebase_block(block, event_id)
+            tf.write(block)
+            self.header1_srv_count += 1
+            self.merge_descriptions(events)
+            self.update_progress(self.s_IIII.unpack_from(block)[3], len(block))
+        # Removing unused entries.
+        cache.prune(keys)
+
+    def rebase_block(self, block, event_id, service=None, starts=None):
+        """ Adapts the encoded service block to its position and service.
+
+            :param block: encoded service block
+            :param event_id: the last event ID before this block
+            :param service: new (sid, nid, tid) values of the block
+            :param starts: new start times of the events (if they differ from the encoded ones only by an offset)
+            :return: the block data and the last used event ID.
+        """
+        block = bytearray(block)
+        count = self.s_IIII.unpack_from(block)[3]
+        if service:
+            self.s_IIII.pack_into(block, 0, *service, count)
+
+        pack_into = self.s_b_H.pack_into
+        s_time = self.s_b_HBBB
+        bcd = self.BCD
+        epoch_date = self.EPOCH_DVB_DATE
+        pos = self.s_IIII.size
+
+        for i in range(count):
+            event_id = event_id % 0xffff + 1
+            # EVENT HEADER (3 bytes) + EVENT DATA (size from the header). ID is the first value of the data.
+            pack_into(block, pos + 3, event_id)
+            if starts:
+                start = int(starts[i])
+                # DATE and start time.
+                s_time.pack_into(block, pos + 5, epoch_date + start // 86400,
+                                 bcd[start // 3600 % 24], bcd[start // 60 % 60], bcd[start % 60])
+            pos += 3 + block[pos + 2]
+
+        return block, event_id
+
+    def write_service(self, tf, sid, nid, tid, events_data, event_id):
+        """ Writes a single service block and returns the last used event ID.
+
+            The block is packed into a preallocated buffer. Time values are converted
+            with integer arithmetic [UTC], so there are no per-event datetime objects.
+        """
+        events = [self.get_event(d) for d in events_data]
+        # EVENT HEADER (3 bytes) + EVENT DATA (10 bytes) + REF DESC (CRC32) for each description.
+        block = bytearray(self.s_IIII.size + sum(17 + 4 * len(e[3]) for e in events))
+        self.s_IIII.pack_into(block, 0, sid, nid, tid, len(events))
+        self.header1_srv_count += 1
+
+        bcd = self.BCD
+        epoch_date = self.EPOCH_DVB_DATE
+        s_event = self.s_event
+        s_refs = self.s_refs
+        add_desc = self.add_description
+        pos = self.s_IIII.size
+
+        for start, duration, short_desc, long_desc in events:
+            # **** (1) : create DESCRIPTION HEADER / DATA ****
+            # Short description (title) [type 0x4d].
+            add_desc(short_desc[0], 0x4d, short_desc[1])
+            # Long description [type 0x4e].
+            for desc in long_desc:
+                add_desc(desc[0], 0x4e, desc[1])
+
+            refs = len(long_desc) + 1
+            start, duration = int(start), int(duration)
+            # Event ID is a 16-bit value, so it starts again from 1 after the maximum.
+            event_id = event_id % 0xffff + 1
+            # EVENT HEADER (3 bytes: 0x01 , 0x00, 10 bytes + number of CRC32 * 4).
+            # EVENT DATA: ID and DATE [always in BIG_ENDIAN], start and duration [BCD].
+            s_event.pack_into(block, pos, 0x01, 0x00, 0x0a + 4 * refs, event_id, epoch_date + start // 86400,
+                              bcd[start // 3600 % 24], bcd[start // 60 % 60], bcd[start % 60],
+                              bcd[duration // 3600 % 24], bcd[duration // 60 % 60], bcd[duration % 60])
+            # REF DESC of the short description (title) and long description parts.
+            s_refs[refs].pack_into(block, pos + s_event.size, short_desc[0], *[d[0] for d in long_desc])
+            pos += s_event.size + 4 * refs
+
+        tf.write(block)
+        self.update_progress(len(events), len(block))
+        return event_id
+
+    def add_description(self, crc, desc_type, data):
+        """ Adds DESCRIPTION DATA to the table or increments its reference count. """
+        if not self._descriptions.add_ref(crc):
+            self.store_description(crc, self.s_BB.pack(desc_type, len(data)) + data, 1)
+
+    def merge_descriptions(self, descriptions):
+        """ Merges the description table (e.g. from a worker process). """
+        add_ref = self._descriptions.add_ref
+        for crc, payload, count in descriptions.items():
+            if not add_ref(crc, count):
+                self.store_description(crc, payload, count)
+
+    def store_description(self, crc, payload, count):
+        self.header2_desc_count += 1
+        self._descriptions.append(crc, payload, count)
+
+        if self._streaming and not self._descriptions.spilled and self._descriptions.size > self._spill_size:
+            self.spill_descriptions()
+
+    def spill_descriptions(self):
+        """ Moves the description payloads to a temporary file.
+
+            Only the table columns are kept in memory after that.
+        """
+        self.log(f"Description table size exceeds {self._spill_size} bytes. Moving data to a temporary file...")
+        self._descriptions.spill()
+
+    def finalize(self, header_data):
+        tmp_path = f"{self.epg_dat_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as dat_fd:
+                # HEADER 1.
+                dat_fd.write(self.s_header.pack(0x98765432, b'ENIGMA_EPG_V8', self.header1_srv_count))
+                # Write first EPG.DAT section.
+                header_data.seek(0)
+                copyfileobj(header_data, dat_fd)
+                self.write_descriptions(dat_fd)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        os.replace(tmp_path, self.epg_dat_path)
+        self.log("The 'epg.dat' file creation is complete.")
+
+    def write_descriptions(self, dat_fd):
+        """ Writes the second EPG.DAT section (descriptions). """
+        self.check_canceled()
+        # HEADER 2
+        s_ii = self.s_II
+        pack_1 = self.s_I.pack(self.header2_desc_count)
+        dat_fd.write(pack_1)
+        # Event MUST BE WRITTEN IN ASCENDING ORDERED using HASH CODE as index.
+        for crc, count, payload in self._descriptions.sorted_items():
+            dat_fd.write(s_ii.pack(crc, count) + payload)
+
+
+def get_events_hash(events_data):
+    """ Returns a hash of the service events data used as the cache key. """
+    data = [(ed.get("e2eventstart"), ed.get("e2eventduration"), ed.get("e2eventtitle", ""),
+             ed.get("e2eventdescription", None)) for ed in events_data]
+    return hashlib.blake2b(pickle.dumps(data, protocol=4), digest_size=16).hexdigest()
+
+
+def get_events_signature(events_data):
+    """ Returns a signature of the service events data and the start time of the first event.
+
+        The start times are relative to the first event, so the signature
+        is the same for event lists that differ only by a time offset.
+    """
+    first = events_data[0].get("e2eventstart") if events_data else 0
+    data = [(ed.get("e2eventstart") - first, ed.get("e2eventduration"), ed.get("e2eventtitle", ""),
+             ed.get("e2eventdescription", None)) for ed in events_data]
+    return hashlib.blake2b(pickle.dumps(data, protocol=4), digest_size=16).digest(), first
+
+
+def encode_services(services, desc_length=None):
+    """ Encodes services data [in a worker process].
+
+        The event IDs of each block start from 1.
+
+        :param services: list of (sid, nid, tid, events data)
+        :param desc_length: maximum length of the long description
+        :return: list of (service block data, description table)
+    """
+    writer = EpgWriter(None, None, desc_length=desc_length)
+    blocks = []
+    for sid, nid, tid, events_data in services:
+        with BytesIO() as tf:
+            writer._descriptions = DescriptionTable()
+            writer.write_service(tf, sid, nid, tid, events_data, 0)
+            blocks.append((tf.getvalue(), writer._descriptions))
+    return blocks
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" Streaming XMLTV reading and writing [without the main app]. """
+
+import gzip
+import os
+import shutil
+import time
+import xml.etree.ElementTree as ET
+from calendar import timegm
+from urllib.request import urlopen
+from xml.sax.saxutils import XMLGenerator, quoteattr
+
+
+def open_source(path):
+    """ Opens the XMLTV file [plain or gzipped] as a binary stream. """
+    f = open(path, "rb")
+    if f.peek(2)[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=f, mode="rb")
+    return f
+
+
+def download(url, path, timeout=30):
+    """ Downloads the XMLTV source to the given path. """
+    with urlopen(url, timeout=timeout) as resp, open(path, "wb") as f:
+        shutil.copyfileobj(resp, f, 1024 * 1024)
+    return path
+
+
+def is_url(src):
+    return src.startswith(("http://", "https://", "ftp://"))
+
+
+def get_timestamp(value):
+    """ Converts the XMLTV time value [YYYYmmddHHMMSS +HHMM] to the UTC timestamp. """
+    value = value.strip()
+    ts = timegm((int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                 int(value[8:10] or 0), int(value[10:12] or 0), int(value[12:14] or 0), 0, 0, 0))
+    tz = value[14:].strip()
+    if len(tz) == 5 and tz[0] in "+-":
+        offset = int(tz[1:3]) * 3600 + int(tz[3:5]) * 60
+        ts = ts - offset if tz[0] == "+" else ts + offset
+    return ts
+
+
+def read_events(path, ids=None, names=None):
+    """ Reads channels and programmes from the XMLTV file in a single pass.
+
+        Only the channels from the given ids or with one of the given display names are read.
+        If both are None, all channels are read.
+
+        :return: dict [channel id -> display names] and dict [channel id -> list of event data sorted by start].
+    """
+    channels, events = {}, {}
+    select_all = ids is None and names is None
+    ids, names = set(ids or ()), set(names or ())
+
+    with open_source(path) as src:
+        context = ET.iterparse(src, events=("start", "end"))
+        _, root = next(context)
+
+        for event, elem in context:
+            if event != "end":
+                continue
+
+            if elem.tag == "channel":
+                ch_id = elem.get("id")
+                ch_names = [n.text for n in elem.iterfind("display-name") if n.text]
+                if select_all or ch_id in ids or names.intersection(ch_names):
+                    channels[ch_id] = ch_names
+                    events[ch_id] = []
+                root.clear()
+            elif elem.tag == "programme":
+                ch_events = events.get(elem.get("channel"), None)
+                if ch_events is None and select_all:
+                    ch_events = events[elem.get("channel")] = []
+                    channels[elem.get("channel")] = []
+
+                if ch_events is not None:
+                    try:
+                        start, stop = get_timestamp(elem.get("start")), get_timestamp(elem.get("stop"))
+                    except (AttributeError, TypeError, ValueError):
+                        pass
+                    else:
+                        ch_events.append({"e2eventstart": start,
+                                          "e2eventduration": stop - start,
+                                          "e2eventtitle": elem.findtext("title", ""),
+                                          "e2eventdescription": elem.findtext("desc", None)})
+                root.clear()
+
+    for ch_events in events.values():
+        ch_events.sort(key=lambda e: e["e2eventstart"])
+
+    return channels, events
+
+
+def get_time_value(timestamp):
+    """ Converts the UTC timestamp to the XMLTV time value. """
+    return time.strftime("%Y%m%d%H%M%S +0000", time.gmtime(timestamp))
+
+
+def open_target(path):
+    """ Opens the gzipped target file for writing. The data is written to a temporary file first. """
+    return gzip.GzipFile(f"{path}.tmp", mode="wb", compresslevel=6, mtime=0)
+
+
+def close_target(target, path, done):
+    """ Closes the target file and replaces the existing one if the writing is done. """
+    target.close()
+    if done:
+        os.replace(f"{path}.tmp", path)
+    else:
+        os.remove(f"{path}.tmp")
+
+
+def write_xmltv(path, channels, events):
+    """ Writes the gzipped XMLTV file incrementally [without building a tree].
+
+        :param path: target file path
+        :param channels: list of (channel id, display name)
+        :param events: dict [channel id -> list of event data]
+    """
+    target, done = open_target(path), False
+    try:
+        xg = XMLGenerator(target, encoding="utf-8", short_empty_elements=True)
+        xg.startDocument()
+        xg.startElement("tv", {"generator-info-name": "DemonEditor"})
+        xg.ignorableWhitespace("\n")
+
+        for ch_id, name in channels:
+            xg.startElement("channel", {"id": ch_id})
+            xg.startElement("display-name", {})
+            xg.characters(name)
+            xg.endElement("display-name")
+            xg.endElement("channel")
+            xg.ignorableWhitespace("\n")
+
+        for ch_id, name in channels:
+            for ed in events.get(ch_id, ()):
+                start = ed.get("e2eventstart")
+                attrs = {"start": get_time_value(start),
+                         "stop": get_time_value(start + ed.get("e2eventduration")),
+                         "channel": ch_id}
+                xg.startElement("programme", attrs)
+                xg.startElement("title", {})
+                xg.characters(ed.get("e2eventtitle", ""))
+                xg.endElement("title")
+                desc = ed.get("e2eventdescription", None)
+                if desc:
+                    xg.startElement("desc", {})
+                    xg.characters(desc)
+                    xg.endElement("desc")
+                xg.endElement("programme")
+                xg.ignorableWhitespace("\n")
+
+        xg.endElement("tv")
+        xg.ignorableWhitespace("\n")
+        xg.endDocument()
+        done = True
+    finally:
+        close_target(target, path, done)
+
+
+def filter_xmltv(src_path, path, ids):
+    """ Writes the gzipped XMLTV subset with the given channels only.
+
+        The source is read in a single pass, and selected elements are copied as they are.
+
+        :return: number of written programmes.
+    """
+    ids = set(ids)
+    count = 0
+    target, done = open_target(path), False
+    try:
+        with open_source(src_path) as src:
+            context = ET.iterparse(src, events=("start", "end"))
+            _, root = next(context)
+            attrs = "".join(f" {k}={quoteattr(v)}" for k, v in root.attrib.items())
+            target.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<{root.tag}{attrs}>\n'.encode("utf-8"))
+
+            for event, elem in context:
+                if event != "end":
+                    continue
+
+                if elem.tag == "channel":
+                    if elem.get("id") in ids:
+                        elem.tail = "\n"
+                        target.write(ET.tostring(elem, encoding="utf-8", xml_declaration=False))
+                    root.clear()
+                elif elem.tag == "programme":
+                    if elem.get("channel") in ids:
+                        elem.tail = "\n"
+                        target.write(ET.tostring(elem, encoding="utf-8", xml_declaration=False))
+                        count += 1
+                    root.clear()
+
+            target.write(f"</{root.tag}>\n".encode("utf-8"))
+        done = True
+    finally:
+        close_target(target, path, done)
+
+    return count
+
+
+def get_channels_path(path):
+    """ Returns the path of the channels file for the XMLTV file [e.g. epg.xml.gz -> epg.channels.xml]. """
+    base = path[:-3] if path.endswith(".gz") else path
+    base = base[:-4] if base.endswith(".xml") else base
+    return f"{base}.channels.xml"
+
+
+def get_service_ref(fav_id, service_type=1):
+    """ Returns the Enigma2 service reference for the EPGImport channels file.
+
+        DVB services have the short [SID:TID:NID:NS] fav id. IPTV services already have the full reference.
+    """
+    data = fav_id.split(":")
+    if len(data) != 4:
+        return fav_id
+
+    try:
+        return f"1:0:{service_type:X}:" + "".join(f"{int(d, 16):X}:" for d in data) + "0:0:0:"
+    except ValueError:
+        return fav_id
+
+
+def write_channels_map(path, mapping):
+    """ Writes the EPGImport channels file [channel id -> list of service references]. """
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        xg = XMLGenerator(f, encoding="utf-8", short_empty_elements=True)
+        xg.startDocument()
+        xg.startElement("channels", {})
+        xg.ignorableWhitespace("\n")
+        for ch_id, refs in mapping.items():
+            for ref in refs:
+                xg.startElement("channel", {"id": ch_id})
+                xg.characters(ref)
+                xg.endElement("channel")
+                xg.ignorableWhitespace("\n")
+        xg.endElement("channels")
+        xg.ignorableWhitespace("\n")
+        xg.endDocument()
+    os.replace(f"{path}.tmp", path)
+
+
+def read_channels_map(path):
+    """ Reads the EPGImport channels file [channel id -> list of service references]. """
+    mapping = {}
+    if not path or not os.path.isfile(path):
+        return mapping
+
+    with open_source(path) as src:
+        for event, elem in ET.iterparse(src):
+            if elem.tag == "channel" and elem.text:
+                mapping.setdefault(elem.get("id"), []).append(elem.text.strip())
+    return mapping
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2023-2026 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" M3U parser benchmarks with synthetic playlists. Runs headless (without GTK and the main app).
+
+    Usage [from the directory containing the 'extensions' package]:
+        python3 -m extensions.streamimport.bench --entries 1000000 [--workers 4]
+"""
+
+import random
+import re
+import sys
+import time
+from argparse import ArgumentParser
+
+from .m3u import parse, get_lines, parse_parallel
+
+REF_PARAMS = re.compile(r'(\S+)="(.*?)"')
+# Size of the data chunks [as read from a file].
+CHUNK_SIZE = 256 * 1024
+
+# Real-world playlist quirks. The parser output must be the same as of the reference one.
+QUIRKS = ("#EXTM3U x-tvg-url=\"http://epg.example.com/epg.xml.gz\"",
+          "#EXTINF:-1 tvg-id=\"one.tv\" tvg-name=\"One\" tvg-logo=\"http://logo/1.png\" group-title=\"News\",One HD",
+          "http://example.com/1.m3u8",
+          "#EXTINF:-1,Name without attributes",
+          "#EXTGRP:Movies",
+          "  http://example.com/2.ts  ",
+          "#EXTINF:0 group-title=\"\" tvg-id=\" spaces.tv \",  Spaces  ",
+          "rtmp://example.com/live/3",
+          "#EXTINF:-1 tvg-name=\"Comma, in name\" group-title=\"A,B\",Comma, in title",
+          "udp://@239.0.0.1:1234",
+          "#EXTINF:-1 tvg-id=\"a\"tvg-name=\"No space\"group-title=\"G\",Glued",
+          "http://example.com/4",
+          "#EXTINF:-1 tvg-name=\"Quote=\"inside\" group-title=\"Q\",Quotes",
+          "http://example.com/5",
+          "#EXTINF:-1\ttvg-id=\"tab.tv\"\ttvg-name=\"Tab\",Tabs",
+          "http://example.com/6",
+          "#EXTINF:-1 tvg-name=\"Unclosed,Unclosed",
+          "http://example.com/7",
+          "#EXTINF:-1 =\"empty key\" tvg-logo=\"\" group-title=\"Канал\",Кириллица NBSP",
+          "http://example.com/8",
+          "#EXTINF:-1 tvg-id=\"dup\" tvg-id=\"second\",Duplicates",
+          "#EXTVLCOPT:http-user-agent=Mozilla/5.0",
+          "http://example.com/9",
+          "# comment with http://url",
+          "not an url",
+          "",
+          "#EXTGRP: Sport #EXTGRP",
+          "#EXTINF:-1 group-title=\"Last\",",
+          "http://example.com/10",
+          "http://example.com/11")
+
+
+def parse_ref(lines):
+    """ Reference [the initial] implementation of the parser. """
+    group = None
+    name = None
+    logo = None
+    ch_id = None
+
+    for line in lines:
+        if line.startswith("#EXTM3U"):
+            pass
+        elif line.startswith("#EXTINF"):
+            line, sep, name = line.rpartition(",")
+            params = dict(REF_PARAMS.findall(line))
+            group = params.get("group-title", None)
+            name = params.get("tvg-name", name)
+            logo = params.get("tvg-logo", None)
+            ch_id = params.get("tvg-id", None)
+        elif line.startswith("#EXTGRP"):
+            group = line.strip("#EXTGRP:").strip()
+        elif not line.startswith("#") and "://" in line:
+            url = line.strip()
+            if name:
+                name = name.strip()
+
+            ch_id = ch_id.strip() if ch_id else ch_id
+            logo = logo.strip() if logo else logo
+            group = group or "No Group"
+
+            yield name, group, ch_id, url, logo
+
+
+def generate_playlist(count, seed=0):
+    """ Returns the lines of a synthetic playlist with the given number of entries. """
+    rnd = random.Random(seed)
+    lines = ["#EXTM3U url-tvg=\"http://epg.example.com/epg.xml.gz\""]
+    append = lines.append
+
+    for i in range(count):
+        kind = rnd.random()
+        name = f"Channel {i} {rnd.choice(('HD', 'FHD', 'SD', '4K'))}"
+        group = f"Group {rnd.randrange(100)}"
+        if kind < 0.8:
+            append(f"#EXTINF:-1 tvg-id=\"ch{i}.tv\" tvg-name=\"{name}\" "
+                   f"tvg-logo=\"http://logos.example.com/{i}.png\" group-title=\"{group}\",{name}")
+        elif kind < 0.9:
+            append(f"#EXTINF:-1,{name}")
+            append(f"#EXTGRP:{group}")
+        elif kind < 0.95:
+            append(f"#EXTINF:-1 catchup=\"default\" catchup-days=\"7\" group-title=\"{group}\",{name}")
+            append("#EXTVLCOPT:http-user-agent=Mozilla/5.0")
+        else:
+            append(rnd.choice(QUIRKS))
+        append(f"http://provider.example.com:8080/live/user/pass/{i}.ts")
+
+    return lines
+
+
+def measure(func, lines, repeat):
+    """ Returns the best time of parsing the lines. """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in func(lines):
+            pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(args=None):
+    parser = ArgumentParser(description="M3U parser benchmark.")
+    parser.add_argument("--entries", type=int, default=100000, help="number of playlist entries [default: 100000]")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="measure parsing of the encoded data in a process pool")
+    args = parser.parse_args(args)
+
+    lines = generate_playlist(args.entries, args.seed)
+    for name, data in (("quirks", QUIRKS), ("synthetic", lines)):
+        if list(parse(data)) != list(parse_ref(data)):
+            print(f"[{name}] Error. The output differs from the reference parser!")
+            return 1
+
+    ref_time = measure(parse_ref, lines, args.repeat)
+    new_time = measure(parse, lines, args.repeat)
+    print(f"[entries: {args.entries}] Reference: {ref_time:.3f} s ({args.entries / ref_time:.0f} entries/s), "
+          f"parser: {new_time:.3f} s ({args.entries / new_time:.0f} entries/s), speedup: {ref_time / new_time:.2f}x.")
+
+    if args.workers:
+        data = "\n".join(lines).encode("utf-8")
+        chunks = [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+        if list(parse_parallel(chunks, "utf-8", args.workers)) != list(parse(lines)):
+            print(f"[workers: {args.workers}] Error. The output differs from the single process parsing!")
+            return 1
+
+        single_time = measure(lambda c: parse(get_lines(c, "utf-8")), chunks, args.repeat)
+        pool_time = measure(lambda c: parse_parallel(c, "utf-8", args.workers), chunks, args.repeat)
+        print(f"[workers: {args.workers}] Data: {len(data) / 1024 ** 2:.1f} MiB, single process: {single_time:.3f} s, "
+              f"process pool: {pool_time:.3f} s, speedup: {single_time / pool_time:.2f}x.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
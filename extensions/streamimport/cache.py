@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2023-2026 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" On-disk cache of the downloaded playlists.
+
+    Each playlist is stored as a compact parsed snapshot [name, group, id, url, logo columns]
+    with the HTTP validators [ETag, Last-Modified] for conditional requests.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+import zlib
+from threading import Lock
+
+from extensions import CONFIG_PATH
+
+CACHE_PATH = f"{CONFIG_PATH}Streamimport{os.sep}playlists{os.sep}"
+
+
+class PlaylistCache:
+    """ Size-bounded playlist cache [URL -> snapshot]. The least recently used entries are evicted first. """
+
+    VERSION = 1
+    # Default maximum total size of the snapshots in bytes.
+    MAX_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, path=CACHE_PATH, max_size=MAX_SIZE):
+        self._path = path
+        self._max_size = max_size
+        self._index_path = f"{path}index.json"
+        self._lock = Lock()
+        self._index = None
+
+    @staticmethod
+    def get_key(url):
+        return hashlib.sha1(url.encode("utf-8", errors="ignore")).hexdigest()
+
+    def get_index(self):
+        if self._index is None:
+            self._index = {}
+            try:
+                with open(self._index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                pass
+            else:
+                if index.get("version", None) == self.VERSION:
+                    self._index = index.get("entries", {})
+        return self._index
+
+    def save_index(self):
+        os.makedirs(self._path, exist_ok=True)
+        with open(f"{self._index_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "entries": self._index}, f)
+        os.replace(f"{self._index_path}.tmp", self._index_path)
+
+    def get_headers(self, url):
+        """ Returns the headers for the conditional request of the URL. """
+        with self._lock:
+            entry = self.get_index().get(self.get_key(url), None)
+
+        headers = {}
+        if entry:
+            if entry.get("etag", None):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified", None):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load(self, url):
+        """ Returns the list of (name, group, id, url, logo) for the URL or None if there is no snapshot. """
+        key = self.get_key(url)
+        with self._lock:
+            entry = self.get_index().get(key, None)
+            if not entry:
+                return None
+
+            try:
+                with open(f"{self._path}{key}", "rb") as f:
+                    columns = pickle.loads(zlib.decompress(f.read()))
+            except (OSError, zlib.error, pickle.UnpicklingError, EOFError):
+                del self._index[key]
+                self.save_index()
+                return None
+
+            entry["used"] = time.time()
+            self.save_index()
+
+        return list(zip(*columns))
+
+    def save(self, url, rows, etag=None, last_modified=None):
+        """ Stores the snapshot of the playlist.
+
+            :param url: playlist URL
+            :param rows: list of (name, group, id, url, logo)
+            :param etag: ETag header value
+            :param last_modified: Last-Modified header value
+        """
+        key = self.get_key(url)
+        columns = tuple(list(c) for c in zip(*rows)) if rows else ((), (), (), (), ())
+        data = zlib.compress(pickle.dumps(columns, protocol=4), 1)
+
+        with self._lock:
+            index = self.get_index()
+            os.makedirs(self._path, exist_ok=True)
+            with open(f"{self._path}{key}.tmp", "wb") as f:
+                f.write(data)
+            os.replace(f"{self._path}{key}.tmp", f"{self._path}{key}")
+
+            index[key] = {"url": url, "etag": etag, "last_modified": last_modified, "size": len(data),
+                          "used": time.time()}
+            self.evict()
+            self.save_index()
+
+    def evict(self):
+        """ Removes the least recently used snapshots while the total size exceeds the limit. """
+        index = self._index
+        total = sum(e["size"] for e in index.values())
+        for key in sorted(index, key=lambda k: index[k]["used"]):
+            if total <= self._max_size:
+                break
+
+            total -= index.pop(key)["size"]
+            try:
+                os.remove(f"{self._path}{key}")
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    pass
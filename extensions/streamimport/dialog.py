@@ -0,0 +1,777 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2023-2026 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" Streams import dialog. """
+
+import os
+import time
+from multiprocessing import get_context, get_all_start_methods
+from enum import IntEnum
+from functools import partial
+from itertools import chain, groupby
+from threading import Event
+
+import requests
+from gi.repository import Gtk, Gdk, GLib
+
+from app.commons import run_task
+from app.eparser import Service
+from app.eparser.ecommons import BqServiceType
+from app.eparser.iptv import MARKER_FORMAT, get_picon_id, get_fav_id
+from app.settings import SettingsType
+from app.ui.main_helper import update_toggle_model, update_popup_filter_model, scroll_to, on_popup_menu
+from app.ui.tasks import BGTaskWidget
+from app.ui.uicommons import IPTV_ICON, Column, UI_RESOURCES_PATH
+from .cache import PlaylistCache
+from .logos import LogoFetcher
+from .m3u import SAMPLE_SIZE, parse, get_lines, detect_encoding, is_splittable, parse_parallel
+from .store import StreamStore
+
+# Start method of the worker processes.
+START_METHOD = "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+
+
+class ImportDialog(Gtk.Window):
+    # Size of the data chunks read from the network.
+    CHUNK_SIZE = 256 * 1024
+    # Number of rows appended to the model at once [while downloading].
+    BATCH_SIZE = 500
+    # Number of rows appended at once when the whole data is available [the view is detached from the model].
+    BULK_SIZE = 10000
+    # Delay (in ms) before loading logos of the visible rows after scrolling.
+    PREFETCH_DELAY = 200
+    # Delay (in ms) before filtering after the filter change.
+    FILTER_DELAY = 150
+    # Minimum number of changed rows for the full refiltering [otherwise only the changed rows are updated].
+    REFILTER_SIZE = 2000
+
+    class Column(IntEnum):
+        """ Model column [row index in the store] and sort IDs of the view columns.
+
+            The data of the rows is kept only in the store and rendered by cell data functions.
+        """
+        INDEX = 0
+        # Sort IDs [the columns are not stored in the model].
+        NAME = 1
+        GROUP = 2
+        SELECTED = 3
+
+    def __init__(self, plugin, **kwargs):
+        super().__init__(title=plugin.LABEL,
+                         destroy_with_parent=True,
+                         window_position=Gtk.WindowPosition.CENTER_ON_PARENT,
+                         transient_for=plugin.app.app_window,
+                         default_width=560,
+                         icon_name="demon-editor",
+                         **kwargs)
+
+        self._plugin = plugin
+        self._app = plugin.app
+        self._groups = set()
+        # Groups deselected in the filter.
+        self._hidden_groups = set()
+        # Data of the rows by the row index [the INDEX column].
+        self._store = StreamStore()
+        # Filter [also search and sort] index. Case-folded names by the row index.
+        self._names = []
+        # Visibility by the row index and indexes of the visible rows.
+        self._visible = bytearray()
+        self._visible_rows = []
+        # The current filter values.
+        self._query = ""
+        self._hidden_ids = set()
+        self._filter_id = 0
+        # Incremented on each data clearing. Used to stop the background loading of the previous data.
+        self._load_id = 0
+        cache_size = plugin.config.get("playlist_cache_size", PlaylistCache.MAX_SIZE // 1024 ** 2)
+        self._playlist_cache = PlaylistCache(max_size=cache_size * 1024 ** 2)
+        self._logos = LogoFetcher(log_func=self.log)
+        self._prefetch_logos = plugin.config.get("prefetch_logos", True)
+        # Minimal size of the playlist files parsed in a process pool [0 - disabled].
+        self._parallel_size = plugin.config.get("parallel_parsing_size", 32) * 1024 ** 2
+        self._prefetch_id = 0
+
+        _base_path = os.path.dirname(__file__)
+        builder = Gtk.Builder.new_from_file(f"{_base_path}{os.sep}dialog.ui")
+
+        self.add(builder.get_object("main_box"))
+        self._view = builder.get_object("view")
+        self._popup_menu = builder.get_object("popup_menu")
+        self._select_all_item = builder.get_object("select_all_item")
+        self._remove_selection_item = builder.get_object("remove_selection_item")
+        self._view.connect("select-all", lambda v: self.update_selection(True))
+        self._view.connect_data("button-press-event", self.on_button_press)
+        self._select_all_item.connect("activate", lambda i: self.update_selection(True))
+        self._remove_selection_item.connect("activate", lambda i: self.update_selection(False))
+
+        self._model = builder.get_object("model")
+        self._columns = list(range(self._model.get_n_columns()))
+        # The filter and sort models are created over the list store. They are dropped while appending in bulk.
+        self._filter_model = None
+        self._view_model = None
+        self._sort_column = (None, Gtk.SortType.ASCENDING)
+        self.attach_models()
+        self._view.set_search_equal_func(self.search_equal_func)
+        self._filter_group_model = builder.get_object("filter_group_list_store")
+        self._filter_entry = builder.get_object("filter_entry")
+        self._filter_entry.connect("search-changed", self.on_filter_changed)
+        renderer_toggle = builder.get_object("filter_group_renderer_toggle")
+        renderer_toggle.connect("toggled", self.on_group_toggled)
+
+        self._chooser_button = builder.get_object("file_chooser_button")
+        self._chooser_button.connect("file-set", self.on_file_set)
+        self._url_entry = builder.get_object("url_entry")
+        self._url_entry.connect("activate", self.on_url_set)
+        self._url_entry.connect("focus-out-event", lambda e, ev: e.set_name("GtkEntry"))
+
+        self._input_text_view = builder.get_object("input_text_view")
+        self._input_text_view.get_buffer().connect("paste-done", self.on_paste_text)
+        selected_renderer = builder.get_object("selected_renderer")
+        selected_renderer.connect("toggled", self.on_selected_toggled)
+        builder.get_object("selected_column").set_cell_data_func(selected_renderer, self.selected_data_func)
+        builder.get_object("group_column").set_cell_data_func(builder.get_object("group_renderer"),
+                                                              self.text_data_func, lambda i: self._store.get_group(i))
+        builder.get_object("version_label").set_text(f"Ver: {plugin.VERSION}")
+
+        self._service_type_box = builder.get_object("service_type_box")
+        self._single_bq_button = builder.get_object("single_bq_button")
+        self._split_bq_button = builder.get_object("split_bq_button")
+        self._sub_bq_button = builder.get_object("sub_bq_button")
+        self._import_button = builder.get_object("import_button")
+        self._import_button.connect("clicked", self.on_import)
+        self.connect("hide", self.clear_data)
+        self.connect("delete-event", self.on_destroy)
+        # Neutrino.
+        builder.get_object("options_grid").set_visible(self._app.is_enigma)
+        # Channel logos.
+        column = builder.get_object("name_column")
+        column.set_cell_data_func(builder.get_object("logo_renderer"), self.logo_data_func)
+        column.set_cell_data_func(builder.get_object("name_renderer"), self.text_data_func,
+                                  lambda i: self._store.names[i])
+        self._view.connect("query-tooltip", self.on_view_query_tooltip)
+        if self._prefetch_logos:
+            adjustment = self._view.get_vadjustment()
+            adjustment.connect("value-changed", self.on_view_scrolled)
+            adjustment.connect("changed", self.on_view_scrolled)
+
+        style_provider = Gtk.CssProvider()
+        style_provider.load_from_path(f"{UI_RESOURCES_PATH}style.css")
+        self._url_entry.get_style_context().add_provider_for_screen(Gdk.Screen.get_default(), style_provider,
+                                                                    Gtk.STYLE_PROVIDER_PRIORITY_USER)
+
+    def on_destroy(self, window, event):
+        """ Used to prevent window deletion and destroying. """
+        window.hide()
+        return True
+
+    def logo_data_func(self, column, renderer, model, itr, data):
+        url = self._store.logos[model.get_value(itr, self.Column.INDEX)]
+        renderer.set_property("pixbuf", self._logos.get(url) or IPTV_ICON)
+
+    def selected_data_func(self, column, renderer, model, itr, data):
+        renderer.set_property("active", self._store.selection[model.get_value(itr, self.Column.INDEX)])
+
+    def text_data_func(self, column, renderer, model, itr, get_text):
+        renderer.set_property("text", get_text(model.get_value(itr, self.Column.INDEX)))
+
+    def sort_func(self, model, itr1, itr2, get_key):
+        """ Compares the rows by the store values [get_key returns the value by the row index]. """
+        index = self.Column.INDEX
+        key1, key2 = get_key(model.get_value(itr1, index)), get_key(model.get_value(itr2, index))
+        return (key1 > key2) - (key1 < key2)
+
+    def search_equal_func(self, model, column, key, itr, data=None):
+        """ Returns False if the row name starts with the key [as the default search function]. """
+        return not self._names[model.get_value(itr, self.Column.INDEX)].startswith(key.casefold())
+
+    def on_view_query_tooltip(self, view, x, y, keyboard_mode, tooltip):
+        dest = view.get_dest_row_at_pos(x, y)
+        if not dest:
+            return False
+
+        path, pos = dest
+        index = view.get_model()[path][self.Column.INDEX]
+        url = self._store.logos[index]
+        tooltip.set_text(self._store.names[index])
+        tooltip.set_icon(self._logos.get(url))
+        view.set_tooltip_row(tooltip, path)
+
+        if url:
+            self._logos.fetch(url, self.on_logo_loaded)
+
+        return True
+
+    def on_logo_loaded(self, url, pix):
+        self._view.queue_draw()
+
+    def on_view_scrolled(self, adjustment):
+        if self._prefetch_id:
+            GLib.source_remove(self._prefetch_id)
+        self._prefetch_id = GLib.timeout_add(self.PREFETCH_DELAY, self.prefetch_logos)
+
+    def prefetch_logos(self):
+        """ Loads logos of the visible rows. """
+        self._prefetch_id = 0
+        visible = self._view.get_visible_range()
+        if visible:
+            model, logos = self._view.get_model(), self._store.logos
+            start, end = visible
+            for i in range(start.get_indices()[0], end.get_indices()[0] + 1):
+                self._logos.fetch(logos[model[i][self.Column.INDEX]], self.on_logo_loaded)
+        return False
+
+    def attach_models(self):
+        """ Creates the filter and sort models over the list store and sets them to the view. """
+        if self._filter_model:
+            return
+
+        self._filter_model = self._model.filter_new()
+        self._filter_model.set_visible_func(self.filter_function)
+        self._view_model = Gtk.TreeModelSort(model=self._filter_model)
+        self._view_model.set_sort_func(self.Column.NAME, self.sort_func, lambda i: self._names[i])
+        self._view_model.set_sort_func(self.Column.GROUP, self.sort_func, lambda i: self._store.get_group(i))
+        self._view_model.set_sort_func(self.Column.SELECTED, self.sort_func, lambda i: self._store.selection[i])
+        column, order = self._sort_column
+        if column is not None:
+            self._view_model.set_sort_column_id(column, order)
+        self._view.set_model(self._view_model)
+
+    def detach_models(self):
+        """ Drops the filter and sort models, so the list store changes don't call the filter and sort functions.
+
+            The sort column is restored by the new models.
+        """
+        if self._filter_model:
+            self._sort_column = self._view_model.get_sort_column_id()
+            self._view.set_model(None)
+            self._filter_model = self._view_model = None
+
+    def clear_data(self, widget=None):
+        self._load_id += 1
+        self._logos.cancel()
+        self.detach_models()
+        self._model.clear()
+        self.attach_models()
+        self._store.clear()
+        self._groups.clear()
+        self._hidden_groups.clear()
+        self.clear_filter_index()
+        self.update_groups()
+        self._filter_entry.set_text("")
+
+    def on_file_set(self, button):
+        self.clear_data()
+
+        path = button.get_filename()
+        if not os.path.isfile(path):
+            return
+
+        self._chooser_button.set_sensitive(False)
+        self.update_from_file(path, self._load_id)
+
+    def on_url_set(self, entry):
+        self.clear_data()
+        self._url_entry.set_progress_fraction(0)
+
+        url = entry.get_text()
+        self._url_entry.set_name("GtkEntry" if url else "digit-entry")
+        if url:
+            self.update_from_url(url, self._load_id)
+
+    def on_paste_text(self, buffer, clip):
+        self.clear_data()
+
+        text = buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), False)
+        self.update_from_text(text, self._load_id)
+
+    @run_task
+    def update_from_text(self, text, load_id):
+        self.load_rows(parse(text.splitlines()), load_id)
+
+    @run_task
+    def update_from_file(self, path, load_id):
+        try:
+            with open(path, "rb") as file:
+                # The encoding is detected by the beginning of the file. The rest is read and decoded in chunks.
+                sample = file.read(SAMPLE_SIZE)
+                encoding = detect_encoding(sample)
+                chunks = chain((sample,), iter(partial(file.read, self.CHUNK_SIZE), b""))
+                size = os.fstat(file.fileno()).st_size
+
+                if 0 < self._parallel_size <= size and (os.cpu_count() or 1) > 1 and is_splittable(encoding):
+                    self.log(f"Parsing the playlist ({size // 1024 ** 2} MiB) in a process pool...")
+                    # The workers are not forked from the app process [with GTK and threads].
+                    records = parse_parallel(chunks, encoding, mp_context=get_context(START_METHOD))
+                else:
+                    records = parse(get_lines(chunks, encoding))
+
+                try:
+                    self.load_rows(records, load_id)
+                finally:
+                    # Stops the worker processes if the loading has been canceled.
+                    records.close()
+        finally:
+            GLib.idle_add(self._chooser_button.set_sensitive, True)
+
+    @run_task
+    def update_from_url(self, url, load_id):
+        """ Downloads and parses the playlist in a background thread.
+
+            The data is decoded and parsed as it arrives. Parsed rows are appended to the model in batches.
+            The cached snapshot of the playlist is used if it has not been modified or the source is not available.
+        """
+        snapshot = []
+        try:
+            headers = self._playlist_cache.get_headers(url)
+            with requests.get(url, headers=headers, timeout=5, stream=True) as resp:
+                if resp.status_code == 304:
+                    if self.load_snapshot(url, load_id):
+                        self.log("The playlist has not been modified. Loaded from the cache.")
+                    else:
+                        # The snapshot is not available. Requesting the whole playlist.
+                        self.update_from_url(url, load_id)
+                    return
+
+                if resp.status_code != 200:
+                    msg = f"HTTP error {resp.status_code} while retrieving from {url}!"
+                    GLib.idle_add(self._app.show_error_message, msg)
+                    self.log(msg)
+                    return
+
+                downloaded = 0
+                # Get total playlist byte size
+                data_size = int(resp.headers.get("content-length", 0))
+                # The charset of the headers is used if specified. Otherwise, the encoding is detected
+                # by the first chunk ['apparent_encoding' is not used because it requires the whole content].
+                content_type = resp.headers.get("content-type", "")
+                encoding = resp.encoding if "charset" in content_type.lower() else None
+                completed = set()
+
+                def get_chunks():
+                    nonlocal downloaded
+                    for data in resp.iter_content(chunk_size=self.CHUNK_SIZE):
+                        if load_id != self._load_id:
+                            return
+
+                        downloaded += len(data)
+                        if data_size:
+                            progress = min(downloaded / data_size, 1)
+                            done = int(100 * progress) // 25 * 25
+                            GLib.idle_add(self._url_entry.set_progress_fraction, progress)
+                            if done not in completed:
+                                completed.add(done)
+                                self.log(f"Downloading playlist...{done}%" if done < 100 else
+                                         "Playlist download complete.")
+                        yield data
+
+                def get_records():
+                    chunks = get_chunks()
+                    first = next(chunks, b"")
+                    lines = get_lines(chain((first,), chunks), encoding or detect_encoding(first))
+                    for record in parse(lines):
+                        snapshot.append(record)
+                        yield record
+
+                if not self.load_rows(get_records(), load_id, self.BATCH_SIZE):
+                    return
+
+                if downloaded < data_size:
+                    self.log("Error. The file size is incorrect.")
+                else:
+                    self._playlist_cache.save(url, snapshot, resp.headers.get("ETag", None),
+                                              resp.headers.get("Last-Modified", None))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if load_id != self._load_id:
+                return
+
+            cached = self._playlist_cache.load(url)
+            if cached is None:
+                msg = f"Playlist download error: {e}"
+                GLib.idle_add(self._app.show_error_message, msg)
+                self.log(msg)
+                return
+
+            self.log(f"Playlist download error: {e}. Loading from the cache...")
+            if snapshot:
+                # Some rows have already been appended. The data is cleared before loading.
+                GLib.idle_add(self.reload_rows, cached, load_id)
+            else:
+                self.load_rows(cached, load_id)
+        except requests.exceptions.RequestException as e:
+            msg = f"Playlist download error: {e}"
+            GLib.idle_add(self._app.show_error_message, msg)
+            self.log(msg)
+
+    def load_snapshot(self, url, load_id):
+        """ Appends the rows of the cached playlist snapshot.
+
+            :return: False if there is no snapshot for the URL.
+        """
+        snapshot = self._playlist_cache.load(url)
+        if snapshot is None:
+            return False
+
+        self.load_rows(snapshot, load_id)
+        return True
+
+    def load_rows(self, records, load_id, batch_size=BULK_SIZE):
+        """ Passes the (name, group, id, url, logo) records to the main loop in batches [called in a worker thread].
+
+            Groups are collected here and applied once after the last batch
+            [also if the records reading has been interrupted by an error].
+            :return: False if the loading has been canceled.
+        """
+        batch, groups = [], set()
+        try:
+            for record in records:
+                if load_id != self._load_id:
+                    return False
+
+                batch.append(record)
+                groups.add(record[1])
+                if len(batch) == batch_size:
+                    GLib.idle_add(self.append_rows, batch, load_id)
+                    batch = []
+        finally:
+            GLib.idle_add(self.append_rows, batch, load_id, groups)
+
+        return load_id == self._load_id
+
+    def reload_rows(self, records, load_id):
+        """ Replaces the current data with the given records [in the main loop]. """
+        if load_id == self._load_id:
+            self.clear_data()
+            self.update_from_records(records, self._load_id)
+        return False
+
+    @run_task
+    def update_from_records(self, records, load_id):
+        self.load_rows(records, load_id)
+
+    def append_rows(self, records, load_id, groups=None):
+        """ Appends the records to the store and the model.
+
+            The filter and sort models are dropped while appending large batches
+            and created again after the last batch [or the next small one].
+        """
+        if load_id != self._load_id:
+            return False
+
+        bulk = len(records) >= self.BULK_SIZE
+        if bulk:
+            self.detach_models()
+
+        # The store and the index must be updated before appending, because the filter checks rows on insertion.
+        start = len(self._store)
+        self._store.extend(records)
+        self.update_filter_index(start)
+        append, columns = self._model.insert_with_valuesv, self._columns
+        for index in range(start, len(self._store)):
+            append(-1, columns, (index,))
+
+        if not bulk or groups is not None:
+            self.attach_models()
+
+        if groups is not None:
+            # All groups are selected in the updated filter model.
+            self._groups.update(groups)
+            self._hidden_groups.clear()
+            self.update_groups()
+            self.on_filter_changed()
+        return False
+
+    def on_button_press(self, view, event):
+        empty = bool(len(view.get_model()))
+        self._select_all_item.set_sensitive(empty)
+        self._remove_selection_item.set_sensitive(empty)
+        on_popup_menu(self._popup_menu, event)
+
+    def update_selection(self, select):
+        """ Updates the selection of the visible rows. """
+        self._store.selection.update(self._visible_rows, select)
+        self._view.queue_draw()
+
+    def on_selected_toggled(self, renderer, path):
+        index = self._view.get_model()[path][self.Column.INDEX]
+        self._store.selection[index] = not renderer.get_active()
+        # Notifies the view [and the sort model].
+        itr = self._model.iter_nth_child(None, index)
+        self._model.row_changed(self._model.get_path(itr), itr)
+
+    def on_group_toggled(self, renderer, path):
+        update_toggle_model(self._filter_group_model, path, renderer)
+        self._hidden_groups.clear()
+        self._hidden_groups.update({r[0] for r in self._filter_group_model if not r[1]})
+        self.on_filter_changed()
+
+    def update_groups(self):
+        update_popup_filter_model(self._filter_group_model, self._groups)
+        list(map(lambda g: self._filter_group_model.append((g, True)), sorted(self._groups, reverse=True)))
+
+    def on_filter_changed(self, entry=None):
+        if self._filter_id:
+            GLib.source_remove(self._filter_id)
+        self._filter_id = GLib.timeout_add(self.FILTER_DELAY, self.apply_filter)
+
+    def filter_function(self, model, itr, data):
+        return bool(self._visible[model.get_value(itr, self.Column.INDEX)])
+
+    def clear_filter_index(self):
+        self._names.clear()
+        self._visible = bytearray()
+        self._visible_rows.clear()
+        self._query = ""
+        self._hidden_ids = set()
+
+    def update_filter_index(self, start):
+        """ Adds the store rows [from the start index] to the filter index. """
+        names = [(n or "").casefold() for n in self._store.names[start:]]
+        groups = self._store.groups[start:]
+        self._names.extend(names)
+
+        query, hidden = self._query, self._hidden_ids
+        visible = [i for i, (n, g) in enumerate(zip(names, groups), start) if query in n and g not in hidden]
+        self._visible.extend(bytes(len(names)))
+        for i in visible:
+            self._visible[i] = 1
+        self._visible_rows.extend(visible)
+
+    def apply_filter(self):
+        """ Updates the visibility of rows with the current filter values.
+
+            If the new filter is narrower than the previous one [e.g. the query is extended],
+            only the visible rows are checked. Only changed rows are updated in the model if there are few of them.
+        """
+        self._filter_id = 0
+        query = self._filter_entry.get_text().casefold()
+        group_ids = self._store.group_ids
+        hidden = {group_ids[g] for g in self._hidden_groups if g in group_ids}
+        names, groups = self._names, self._store.groups
+
+        narrower = query.startswith(self._query) and hidden >= self._hidden_ids
+        candidates = self._visible_rows if narrower else range(len(names))
+        if hidden:
+            visible_rows = [i for i in candidates if query in names[i] and groups[i] not in hidden]
+        elif query:
+            visible_rows = [i for i in candidates if query in names[i]]
+        else:
+            visible_rows = list(candidates)
+
+        visible = bytearray(len(names))
+        for i in visible_rows:
+            visible[i] = 1
+
+        if narrower:
+            changed = [i for i in candidates if not visible[i]]
+        else:
+            old = self._visible
+            changed = [i for i, v in enumerate(visible) if v != old[i]]
+
+        self._visible, self._visible_rows = visible, visible_rows
+        self._query, self._hidden_ids = query, hidden
+
+        if not self._filter_model:
+            # The models are detached. The new ones use the current visibility.
+            return False
+
+        if len(changed) >= self.REFILTER_SIZE:
+            self._view.set_model(None)
+            self._filter_model.refilter()
+            self._view.set_model(self._view_model)
+        else:
+            model = self._model
+            for i in changed:
+                itr = model.iter_nth_child(None, i)
+                model.row_changed(model.get_path(itr), itr)
+
+        return False
+
+    def on_import(self, button):
+        """ Starts the import of the selected rows.
+
+            Services are created from the store records in a background task.
+            Bouquets and services are added to the main app data at once after that [in the main loop].
+        """
+        settings_type = self._app.app_settings.setting_type
+        if not self.get_root_iter(settings_type):
+            self._app.show_error_message("Error. Load your data first!")
+            return
+
+        indexes = self.get_selected_indexes()
+        if not indexes:
+            self._app.show_error_message("Error. No channels selected!")
+            return
+
+        records = [self._store.get_record(i) for i in indexes]
+        srv_type = self._service_type_box.get_active_id() if settings_type is SettingsType.ENIGMA_2 else None
+        single = self._single_bq_button.get_active() or settings_type is SettingsType.NEUTRINO_MP
+        split = self._split_bq_button.get_active()
+        cancel_event = Event()
+        task = None
+
+        def process():
+            if single:
+                groups = (("IPTV", records),)
+            else:
+                def grouper(row):
+                    return row[1]
+
+                groups = groupby(sorted(records, key=grouper), key=grouper)
+
+            bouquets, done, last_update = [], 0, 0
+            for name, rows in groups:
+                services = []
+                for srv in self.get_group_services(rows, settings_type, srv_type):
+                    if cancel_event.is_set():
+                        self.log("Import canceled.")
+                        return
+
+                    services.append(srv)
+                    done += 1
+                    now = time.monotonic()
+                    if task and now - last_update > 0.5:
+                        last_update = now
+                        GLib.idle_add(task.set_tooltip_text, f"Services: {done} [streams: {len(records)}]")
+                bouquets.append((name, services))
+
+            GLib.idle_add(self.commit_import, bouquets, settings_type, single, split)
+
+        def on_task_destroy(widget):
+            cancel_event.set()
+            self._import_button.set_sensitive(True)
+
+        self._import_button.set_sensitive(False)
+        task = BGTaskWidget(self._app, f"Importing {len(records)} streams...", process)
+        # The task widget is destroyed when the task is stopped [or finished].
+        task.connect("destroy", on_task_destroy)
+        self._app.emit("add-background-task", task)
+
+    def commit_import(self, bouquets, settings_type, single, split):
+        """ Adds the imported bouquets and services [in the main loop]. """
+        model = self._app.bouquets_view.get_model()
+        itr = self.get_root_iter(settings_type)
+        if not itr:
+            self._app.show_error_message("Error. Load your data first!")
+            return False
+
+        root_path = model.get_path(itr)
+        bq_itr = itr
+
+        if single:
+            name, services = bouquets[0]
+            bq_itr = self.append_bouquet(name, model, itr, services)
+        elif split:
+            for g, services in bouquets:
+                bq_itr = self.append_bouquet(g, model, itr, services)
+        else:
+            itr = self.append_bouquet("IPTV", model, itr, ())
+            bq_itr = itr
+            for g, services in bouquets:
+                self.append_bouquet(g, model, itr, services)
+
+        scroll_to(model.get_path(bq_itr), self._app.bouquets_view, [root_path])
+        self._app.show_info_message("Done!")
+        return False
+
+    def get_root_iter(self, settings_type):
+        """ Returns the iter of the root row [bouquets type] for the imported bouquets. """
+        model = self._app.bouquets_view.get_model()
+        if settings_type is SettingsType.ENIGMA_2:
+            return model.get_iter_first()
+        return model.get_iter(Gtk.TreePath.new_from_indices([len(model) - 1]))
+
+    def get_selected_indexes(self):
+        """ Returns the store indexes of the selected rows in the view order. """
+        if not self._view_model or self._view_model.get_sort_column_id()[0] is None:
+            # The view is not sorted [or the models are detached]. The visible rows are in the store order.
+            indexes = self._visible_rows
+        else:
+            indexes = [r[self.Column.INDEX] for r in self._view_model]
+        return self._store.selection.filter(indexes)
+
+    def append_bouquet(self, name, model, itr, services):
+        """ Adds new bouquet and returns iter of appended row. """
+        bqs = self._app.current_bouquets
+        cur_services = self._app.current_services
+        bq_type = model.get_value(itr, Column.BQ_TYPE)
+
+        bq_name = self.get_bouquet_name(bqs, name, bq_type)
+        bqs[f"{bq_name}:{bq_type}"] = [s.fav_id for s in services]
+        cur_services.update({s.fav_id: s for s in services})
+        bq = (bq_name, None, None, bq_type)
+        return model.append(itr, bq)
+
+    def get_group_services(self, rows, settings_type, srv_type=None):
+        """ Returns a generator of services of the (name, group, id, url, logo) records [markers included]. """
+        params = [0, 0, 0, 0]
+
+        aggr = [None] * 10
+        s_aggr = aggr[: -3]
+        m_name = BqServiceType.MARKER.name
+        st = BqServiceType.IPTV.name
+        p_id = "1_0_1_0_0_0_0_0_0_0.png"
+        picon = None
+
+        groups = set()
+        m_counter = 0
+        sid_counter = 0
+        for name, grp, ch_id, url, logo in rows:
+            if settings_type is SettingsType.ENIGMA_2:
+                if grp and grp not in groups:
+                    groups.add(grp)
+                    m_counter += 1
+                    fav_id = MARKER_FORMAT.format(m_counter, grp, grp)
+                    yield Service(None, None, None, grp, *aggr[0:3], m_name, *aggr, fav_id, None)
+            sid_counter += 1
+            params[0] = sid_counter
+            fav_id = get_fav_id(url, name, settings_type, params, srv_type)
+            if settings_type is SettingsType.ENIGMA_2:
+                p_id = get_picon_id(params, srv_type)
+
+            if all((name, url, fav_id)):
+                yield Service(None, None, IPTV_ICON, name, *aggr[0:3], st, picon, p_id, *s_aggr, url, fav_id, None)
+            else:
+                self.log(f"Import error: name[{name}], url[{url}], fav id[{fav_id}]")
+
+    def get_bouquet_name(self, bouquets, base_name, bq_type):
+        count = 0
+        key = f"{base_name}:{bq_type}"
+        bq_name = base_name
+        #  Generating name of new bouquet.
+        while key in bouquets:
+            count += 1
+            bq_name = f"{base_name}{count}"
+            key = f"{bq_name}:{bq_type}"
+
+        return bq_name
+
+    def log(self, msg):
+        self._plugin.log(msg)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2023-2026 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" Channel logos loading with in-memory and on-disk thumbnail caches. """
+
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from gi.repository import GLib
+
+from app.ui.main_helper import get_pixbuf_from_data
+from extensions import CONFIG_PATH
+
+LOGOS_PATH = f"{CONFIG_PATH}Streamimport{os.sep}logos{os.sep}"
+
+
+class LogoFetcher:
+    """ Loads logos in a bounded thread pool with a shared HTTP session.
+
+        Requests for the same URL are merged. Loaded logos are kept in the LRU cache of pixbufs,
+        and their resized thumbnails are stored on disk [PNG].
+        All public methods and callbacks are called in the main loop.
+    """
+    WORKERS = 4
+    TIMEOUT = 5
+    # Maximum number of pixbufs in memory.
+    MEMORY_SIZE = 1000
+    # Maximum number of thumbnails on disk.
+    DISK_SIZE = 10000
+
+    def __init__(self, path=LOGOS_PATH, size=64, workers=WORKERS, memory_size=MEMORY_SIZE, disk_size=DISK_SIZE,
+                 log_func=print):
+        self._path = path
+        self._size = size
+        self._memory_size = memory_size
+        self._disk_size = disk_size
+        self.log = log_func
+
+        self._cache = OrderedDict()
+        # URL -> list of callbacks.
+        self._pending = {}
+        self._failed = set()
+        # Incremented on cancel. Used to skip the queued requests.
+        self._generation = 0
+
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._executor.submit(self.prune)
+
+    def get(self, url):
+        """ Returns the pixbuf from the memory cache or None. """
+        pix = self._cache.get(url, None)
+        if pix:
+            self._cache.move_to_end(url)
+        return pix
+
+    def fetch(self, url, callback=None):
+        """ Loads the logo [if it is not loaded yet] and calls callback(url, pixbuf) after that. """
+        if not url or url in self._failed:
+            return
+
+        pix = self.get(url)
+        if pix:
+            if callback:
+                callback(url, pix)
+            return
+
+        callbacks = self._pending.get(url, None)
+        if callbacks is None:
+            self._pending[url] = callbacks = []
+            self._executor.submit(self.load, url, self._generation)
+
+        if callback:
+            callbacks.append(callback)
+
+    def cancel(self):
+        """ Cancels the queued requests. """
+        self._generation += 1
+        self._pending.clear()
+        self._failed.clear()
+
+    def close(self):
+        self.cancel()
+        self._executor.shutdown(wait=False)
+        self._session.close()
+
+    def load(self, url, generation):
+        """ Loads the logo [in a worker thread].
+
+            The URL is always released from the pending ones [also on unexpected errors].
+        """
+        pix = None
+        try:
+            if generation == self._generation:
+                pix = self.load_logo(url)
+        except (requests.exceptions.RequestException, OSError, GLib.Error) as e:
+            self.log(f"Error [update logo]: {e}")
+        finally:
+            GLib.idle_add(self.on_loaded, url, pix, generation)
+
+    def on_loaded(self, url, pix, generation):
+        if generation != self._generation:
+            return False
+
+        callbacks = self._pending.pop(url, ())
+        if pix:
+            self._cache[url] = pix
+            if len(self._cache) > self._memory_size:
+                self._cache.popitem(last=False)
+            for callback in callbacks:
+                callback(url, pix)
+        else:
+            self._failed.add(url)
+        return False
+
+    def get_path(self, url):
+        return f"{self._path}{hashlib.sha1(url.encode('utf-8', errors='ignore')).hexdigest()}.png"
+
+    def load_logo(self, url):
+        path = self.get_path(url)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                pix = get_pixbuf_from_data(f.read(), self._size, self._size)
+            if pix:
+                # The modification time is used for pruning.
+                os.utime(path)
+                return pix
+
+        with self._session.get(url, timeout=self.TIMEOUT) as resp:
+            if resp.status_code != 200:
+                return None
+            pix = get_pixbuf_from_data(resp.content, self._size, self._size)
+
+        if pix:
+            done, data = pix.save_to_bufferv("png", [], [])
+            if done:
+                os.makedirs(self._path, exist_ok=True)
+                with open(f"{path}.tmp", "wb") as f:
+                    f.write(data)
+                os.replace(f"{path}.tmp", path)
+        return pix
+
+    def prune(self):
+        """ Removes the oldest thumbnails if their number exceeds the limit. """
+        if not os.path.isdir(self._path):
+            return
+
+        with os.scandir(self._path) as it:
+            files = [(e.stat().st_mtime, e.path) for e in it if e.is_file()]
+
+        if len(files) > self._disk_size:
+            files.sort()
+            for mtime, path in files[:len(files) - self._disk_size]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2023-2026 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" M3U playlists parsing [without GTK and the main app]. """
+
+import codecs
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+
+PARAMS = re.compile(r'(\S+)="(.*?)"')
+# Attributes of the #EXTINF lines used in the records.
+ATTRIBUTES = ("group-title", "tvg-name", "tvg-logo", "tvg-id")
+NO_ATTRIBUTES = (None,) * len(ATTRIBUTES)
+DEFAULT_GROUP = "No Group"
+DEFAULT_ENCODING = "utf-8"
+# Size of the data used for the encoding detection.
+SAMPLE_SIZE = 64 * 1024
+# Byte order marks. UTF-32 marks start with the UTF-16 ones, so they are checked first.
+BOMS = ((codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"), (codecs.BOM_UTF8, "utf-8-sig"),
+        (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+# Size of the data pieces parsed in the worker processes.
+PIECE_SIZE = 4 * 1024 * 1024
+# Record boundary [the start of the #EXTINF line] in ASCII compatible encodings.
+BOUNDARY = b"\n#EXTINF"
+
+
+def detect_encoding(sample):
+    """ Returns the encoding of the data by its first bytes [up to SAMPLE_SIZE].
+
+        BOM and UTF-8 [the most common case] are checked first.
+        The 'chardet' package [if available] is used only for other encodings.
+    """
+    sample = sample[:SAMPLE_SIZE]
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    try:
+        # The incremental decoder allows an incomplete char at the end of the sample.
+        codecs.getincrementaldecoder(DEFAULT_ENCODING)().decode(sample)
+    except UnicodeDecodeError:
+        pass
+    else:
+        return DEFAULT_ENCODING
+
+    try:
+        import chardet
+    except ModuleNotFoundError:
+        return DEFAULT_ENCODING
+    else:
+        return chardet.detect(sample).get("encoding", None) or DEFAULT_ENCODING
+
+
+def get_lines(chunks, encoding):
+    """ Returns a generator of the lines of the given byte chunks with incremental decoding. """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    tail = ""
+    for data in chunks:
+        text = tail + decoder.decode(data)
+        if text.endswith("\r"):
+            # The "\r\n" line break may be split between the chunks.
+            lines = text.splitlines()
+            tail = lines.pop() + "\r"
+        else:
+            # The last line may be incomplete. The sentinel char is always in the last [incomplete] part.
+            lines = (text + "\0").splitlines()
+            tail = lines.pop()[:-1]
+        yield from lines
+
+    yield from (tail + decoder.decode(b"", final=True)).splitlines()
+
+
+@lru_cache(maxsize=64)
+def get_layout(keys):
+    """ Returns the layout of the #EXTINF lines with the given sequence of attribute keys.
+
+        Such lines split by quotes have the [prefix + ' key1=', value1, ' key2=', value2, ..., rest] parts.
+        The layout is (' key1=', [' key2=', ...], getter of the ATTRIBUTES values from the parts).
+        The layouts are used only for the lines with the same number of quotes [2 per key].
+    """
+    if not keys or any('"' in k for k in keys):
+        return None
+
+    indexes = {k: 2 * i + 1 for i, k in enumerate(keys)}
+    # Absent values are taken from the None item appended to the parts.
+    getter = itemgetter(*(indexes.get(a, 2 * len(keys) + 1) for a in ATTRIBUTES))
+    return f" {keys[0]}=", [f" {k}=" for k in keys[1:]], getter
+
+
+def get_attributes(line, layouts):
+    """ Returns the ATTRIBUTES values [None if absent] of the #EXTINF line.
+
+        The values are the same as of 'dict(PARAMS.findall(line))'. The lines of a playlist usually have
+        the same attributes, so the layouts of the previous lines [by the number of quotes] are checked first.
+        Only the needed values are extracted.
+    """
+    count = line.count('"')
+    if not count:
+        return NO_ATTRIBUTES
+
+    layout = layouts.get(count, None)
+    if layout:
+        first, separators, getter = layout
+        parts = line.split('"')
+        # Values of the lines with the layout have no line breaks and don't end with '='
+        # [otherwise the key would be extended to the closing quote].
+        if (parts[2:-1:2] == separators and parts[0].endswith(first) and line.count('="') * 2 == count
+                and "\n" not in line):
+            parts.append(None)
+            return getter(parts)
+
+    params = PARAMS.findall(line)
+    layout = get_layout(tuple(k for k, v in params))
+    if layout and 2 * len(params) == count:
+        layouts[count] = layout
+
+    params = dict(params)
+    return tuple(params.get(a, None) for a in ATTRIBUTES)
+
+
+def parse(lines):
+    """ Returns a generator of (name, group, id, url, logo) records for the playlist lines.
+
+        The attributes of the last #EXTINF [and #EXTGRP] line apply to the following URL lines.
+    """
+    group = name = logo = ch_id = None
+    layouts = {}
+
+    for line in lines:
+        if line[:1] == "#":
+            if line.startswith("#EXTINF"):
+                line, sep, name = line.rpartition(",")
+                group, tvg_name, logo, ch_id = get_attributes(line, layouts)
+                if tvg_name is not None:
+                    name = tvg_name
+            elif line.startswith("#EXTGRP"):
+                group = line.strip("#EXTGRP:").strip()
+        elif "://" in line:
+            if name:
+                name = name.strip()
+            if ch_id:
+                ch_id = ch_id.strip()
+            if logo:
+                logo = logo.strip()
+            group = group or DEFAULT_GROUP
+
+            yield name, group, ch_id, line.strip(), logo
+
+
+def is_splittable(encoding):
+    """ Checks if the data in the given encoding can be split by the record boundaries.
+
+        The encoding must be ASCII compatible and stateless.
+    """
+    if codecs.lookup(encoding).name.startswith(("iso2022", "utf-7", "hz")):
+        return False
+    return "\n#EXTINF".encode(encoding).endswith(BOUNDARY)
+
+
+def get_pieces(chunks, size=PIECE_SIZE):
+    """ Returns a generator of the data pieces [at least of the given size] split by the record boundaries. """
+    buf = bytearray()
+    for data in chunks:
+        buf += data
+        if len(buf) >= size:
+            pos = buf.rfind(BOUNDARY)
+            if pos >= 0:
+                # The line break stays in the current piece.
+                yield bytes(buf[:pos + 1])
+                del buf[:pos + 1]
+
+    if buf:
+        yield bytes(buf)
+
+
+def parse_piece(data, encoding):
+    """ Returns a list of the records of the data piece [called in a worker process]. """
+    return list(parse(get_lines((data,), encoding)))
+
+
+def parse_parallel(chunks, encoding, workers=None, mp_context=None):
+    """ Returns a generator of the records of the data chunks parsed in a process pool.
+
+        The data is split by the #EXTINF lines, which reset all the attributes of the following URL lines,
+        so the pieces are parsed independently. The records are returned in the file order.
+        The pending pieces are canceled when the generator is closed.
+        The 'mp_context' [multiprocessing context] defines the start method of the worker processes.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+    # Pieces are read ahead only for the busy workers and the next ones.
+    max_pending = 2 * (workers or os.cpu_count() or 1)
+    pending = deque()
+    try:
+        for piece in get_pieces(chunks):
+            pending.append(executor.submit(parse_piece, piece, encoding))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2023-2026 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+""" Compact columnar storage of the imported streams [without GTK and the main app].
+
+    Groups are interned [stored as IDs]. Rarely used strings [ids, urls, logos]
+    are packed into blocks and materialized only on access.
+"""
+
+from array import array
+from itertools import accumulate
+
+
+class PackedStrings:
+    """ Append-only list of strings packed into blocks [a single str and offsets per block]. """
+
+    BLOCK_SIZE = 4096
+
+    def __init__(self):
+        self._blocks = []
+        self._offsets = []
+        self._tail = []
+
+    def __len__(self):
+        return len(self._blocks) * self.BLOCK_SIZE + len(self._tail)
+
+    def __getitem__(self, index):
+        block, pos = divmod(index, self.BLOCK_SIZE)
+        if block < len(self._blocks):
+            offsets = self._offsets[block]
+            return self._blocks[block][offsets[pos]:offsets[pos + 1]]
+        return self._tail[pos]
+
+    def extend(self, values):
+        """ Appends the values. None is stored as an empty string. """
+        tail, size = self._tail, self.BLOCK_SIZE
+        for value in values:
+            tail.append(value or "")
+            if len(tail) == size:
+                self.pack()
+                tail = self._tail
+
+    def pack(self):
+        """ Packs the strings of the last [full] block. """
+        self._blocks.append("".join(self._tail))
+        self._offsets.append(array("I", accumulate(map(len, self._tail), initial=0)))
+        self._tail = []
+
+    def clear(self):
+        self._blocks.clear()
+        self._offsets.clear()
+        self._tail = []
+
+
+class Selection:
+    """ Selection state of the rows [bitset]. """
+
+    def __init__(self):
+        self._bits = bytearray()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        return bool(self._bits[index >> 3] & (1 << (index & 7)))
+
+    def __setitem__(self, index, value):
+        if value:
+            self._bits[index >> 3] |= 1 << (index & 7)
+        else:
+            self._bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def extend(self, count, value=True):
+        """ Adds the given number of rows with the same state. """
+        start, self._size = self._size, self._size + count
+        self._bits.extend(bytes((self._size + 7) // 8 - len(self._bits)))
+        if value:
+            # Partial bytes are set bit by bit, full bytes at once.
+            head, tail = min((start + 7) // 8 * 8, self._size), max(self._size // 8 * 8, start)
+            for i in range(start, head):
+                self[i] = True
+            if tail > head:
+                self._bits[head // 8:tail // 8] = b"\xff" * ((tail - head) // 8)
+            for i in range(max(tail, head), self._size):
+                self[i] = True
+
+    def update(self, indexes, value):
+        """ Sets the state of the rows with the given indexes. """
+        for i in indexes:
+            self[i] = value
+
+    def filter(self, indexes):
+        """ Returns a list of the selected indexes [in the given order]. """
+        bits = self._bits
+        return [i for i in indexes if bits[i >> 3] >> (i & 7) & 1]
+
+    def clear(self):
+        self._bits = bytearray()
+        self._size = 0
+
+
+class StreamStore:
+    """ Columnar storage of the (name, group, id, url, logo) records. """
+
+    def __init__(self):
+        self.names = []
+        self.groups = array("I")
+        self.group_names = []
+        self.group_ids = {}
+        self.ids = PackedStrings()
+        self.urls = PackedStrings()
+        self.logos = PackedStrings()
+        self.selection = Selection()
+
+    def __len__(self):
+        return len(self.names)
+
+    def extend(self, records):
+        """ Appends the records. New rows are selected. """
+        group_ids, group_names = self.group_ids, self.group_names
+        for name, group, ch_id, url, logo in records:
+            self.names.append(name)
+            g_id = group_ids.get(group, None)
+            if g_id is None:
+                g_id = group_ids[group] = len(group_names)
+                group_names.append(group)
+            self.groups.append(g_id)
+
+        self.ids.extend(r[2] for r in records)
+        self.urls.extend(r[3] for r in records)
+        self.logos.extend(r[4] for r in records)
+        self.selection.extend(len(records))
+
+    def get_group(self, index):
+        return self.group_names[self.groups[index]]
+
+    def get_record(self, index):
+        """ Returns the (name, group, id, url, logo) record of the row. """
+        return (self.names[index], self.group_names[self.groups[index]], self.ids[index], self.urls[index],
+                self.logos[index])
+
+    def clear(self):
+        self.names.clear()
+        self.groups = array("I")
+        self.group_names.clear()
+        self.group_ids.clear()
+        self.ids.clear()
+        self.urls.clear()
+        self.logos.clear()
+        self.selection.clear()
+
+
+if __name__ == "__main__":
+    pass
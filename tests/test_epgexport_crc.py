@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2024 Dmitriy Yefremov
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# Author: Dmitriy Yefremov
+#
+
+
+""" Tests of the epg.dat CRC32 routines [without GTK and the main app].
+
+    Run from the repository root: python3 -m pytest tests or python3 -m unittest discover tests
+"""
+
+import random
+import unittest
+
+from extensions.epgexport.crc import get_crc32, get_crc32_table
+
+# (data, type) -> CRC [checked with a bitwise non-reflected CRC32 over type, length and data].
+KNOWN = (((b"", 0x4d), 0x5c33cf6b),
+         ((b"Test title", 0x4d), 0xb52fac64),
+         (("Заголовок".encode(), 0x4e), 0xed750e99))
+
+
+class CrcTest(unittest.TestCase):
+
+    def test_known_values(self):
+        for (data, crc_type), crc in KNOWN:
+            with self.subTest(data=data, crc_type=crc_type):
+                self.assertEqual(get_crc32_table(data, crc_type), crc)
+                self.assertEqual(get_crc32(data, crc_type), crc)
+
+    def test_zlib_equals_table(self):
+        """ The zlib [bit-reversed] routine is bit-identical to the reference one. """
+        rnd = random.Random(0)
+        samples = [b"", b"\0", b"\xff" * 255, bytes(range(256))]
+        # The length over 255 is truncated to one byte in both routines.
+        samples.extend(rnd.randbytes(rnd.randint(1, 300)) for _ in range(2000))
+
+        for data in samples:
+            for crc_type in (0x4d, 0x4e):
+                self.assertEqual(get_crc32(data, crc_type), get_crc32_table(data, crc_type),
+                                 f"CRC mismatch: {data!r}, type: {crc_type:#x}")
+
+
+if __name__ == "__main__":
+    unittest.main()